@@ -0,0 +1,154 @@
+# backfill.py — fetch the reports the bot missed, concurrently, and resume where it left off
+import os
+import json
+import asyncio
+from datetime import datetime, timedelta, date as date_cls
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from download_weather_pdf import make_session, fetch_pdf, DownloadError
+from report_pool import report_pdf
+
+STATE_FILE = ".backfill_state.json"   # inside reports/
+
+# Per-date outcome kept in the state file
+FETCHED = "fetched"
+MISSING = "missing"   # server has no report for that date (404/410)
+FAILED  = "failed"    # anything else; retried on the next run
+
+def _days(start: date_cls, end: date_cls) -> List[str]:
+    return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end - start).days + 1)]
+
+def empty_summary_dates(csv_path: str, stations: List[str]) -> set:
+    """Dates whose rows carry no value at all (only NA / empty cells), e.g. the NA filler rows."""
+    if not os.path.exists(csv_path):
+        return set()
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    cols = [c for c in stations if c in df.columns]
+    if "Date" not in df.columns or not cols:
+        return set()
+    has_value = ~df[cols].isin(["", "NA"]).all(axis=1)
+    dated = df.assign(_has=has_value).groupby("Date")["_has"].any()
+    return set(dated[~dated].index)
+
+def missing_report_dates(reports_dir: str, summaries: Dict[str, List[str]],
+                         since: Optional[str] = None, until: Optional[str] = None,
+                         prefix: str = "weather") -> List[str]:
+    """
+    reports/<date> folders that should exist but have no PDF: every day from
+    the first folder (or `since`) to `until` (default today), plus the folder
+    for each summary date that has no values (a report dated D is published
+    as folder D+1).
+    """
+    have = {d for d in os.listdir(reports_dir) if os.path.exists(report_pdf(reports_dir, d, prefix))} \
+        if os.path.isdir(reports_dir) else set()
+    end = datetime.strptime(until, "%Y-%m-%d").date() if until else datetime.now().date()
+    wanted = set()
+    if since or have:
+        start = datetime.strptime(since or min(have), "%Y-%m-%d").date()
+        wanted.update(_days(start, end))
+    for csv_path, stations in summaries.items():
+        for d in empty_summary_dates(csv_path, stations):
+            folder = (datetime.strptime(d, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+            if folder <= end.strftime("%Y-%m-%d") and (not since or folder >= since):
+                wanted.add(folder)
+    return sorted(wanted - have)
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart across all tasks."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class BackfillState:
+    """JSON file of per-date outcomes, rewritten atomically after every date so an interrupted run resumes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.dates: Dict[str, dict] = json.load(f)
+        except Exception:
+            self.dates = {}
+
+    def pending(self, dates: Iterable[str], retry_missing: bool = False) -> List[str]:
+        done = {FETCHED} | (set() if retry_missing else {MISSING})
+        return [d for d in dates if self.dates.get(d, {}).get("status") not in done]
+
+    def mark(self, d: str, status: str, url: str, error: str = "") -> None:
+        prev = self.dates.get(d, {})
+        self.dates[d] = {"status": status, "url": url, "attempts": prev.get("attempts", 0) + 1,
+                         "updated": datetime.now().isoformat(timespec="seconds")}
+        if error:
+            self.dates[d]["error"] = error
+        self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.dates, f, indent=1, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp, self.path)
+
+async def fetch_dates(dates: List[str], url_template: str, reports_dir: str, state: BackfillState,
+                      concurrency: int = 4, rate: float = 2.0, prefix: str = "weather") -> List[str]:
+    """Fetch every date's PDF with at most `concurrency` in flight and `rate` starts/sec; returns dates fetched."""
+    session = make_session(pool_size=max(concurrency, 1))
+    sem = asyncio.Semaphore(max(concurrency, 1))
+    limiter = RateLimiter(rate)
+    fetched: List[str] = []
+
+    async def one(d: str) -> None:
+        url = url_template.format(date=d)
+        async with sem:
+            await limiter.wait()
+            try:
+                # requests is blocking; each fetch runs in a worker thread
+                await asyncio.to_thread(fetch_pdf, session, url, report_pdf(reports_dir, d, prefix), {})
+            except Exception as e:
+                code = getattr(getattr(e, "response", None), "status_code", None)
+                status = MISSING if code in (404, 410) else FAILED
+                print(f"[backfill] {d}: {status} ({e})")
+                state.mark(d, status, url, str(e))
+                return
+        print(f"[backfill] {d}: fetched")
+        state.mark(d, FETCHED, url)
+        fetched.append(d)
+
+    try:
+        await asyncio.gather(*(one(d) for d in dates))
+    finally:
+        session.close()
+    return sorted(fetched)
+
+def backfill_downloads(url_template: str, reports_dir: str, summaries: Dict[str, List[str]],
+                       since: Optional[str] = None, until: Optional[str] = None,
+                       concurrency: int = 4, rate: float = 2.0, retry_missing: bool = False,
+                       prefix: str = "weather") -> List[str]:
+    """Work out the missing report dates, fetch the ones not already settled, return the new folders."""
+    if "{date}" not in url_template:
+        raise DownloadError("url template must contain {date}")
+    # Each report type keeps its own per-date outcomes; the weather report's file keeps its old name
+    name = STATE_FILE if prefix == "weather" else STATE_FILE.replace(".json", f"-{prefix}.json")
+    state = BackfillState(os.path.join(reports_dir, name))
+    missing = missing_report_dates(reports_dir, summaries, since, until, prefix)
+    todo = state.pending(missing, retry_missing)
+    print(f"[backfill] {len(missing)} missing report date(s), {len(todo)} to fetch")
+    if not todo:
+        return []
+    return asyncio.run(fetch_dates(todo, url_template, reports_dir, state, concurrency, rate, prefix))
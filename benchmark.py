@@ -0,0 +1,319 @@
+# benchmark.py — time the weather and hydro extractors over a fixed sample of reports/
+#
+#   python benchmark.py                              20 evenly spaced reports, cold (no page cache)
+#   python benchmark.py --sample 50 --repeat 3 --out bench/new.json
+#   python benchmark.py --baseline bench/base.json --threshold 0.15   exit 1 on a regression
+#   python benchmark.py --import-budget              also exit 1 if an entry module imports too slowly
+#
+# Runs the real parser functions (parse_report, parse_hydro_with_words /
+# _camelot / _text, add_stats, write_summary) and attributes wall time to
+# stages by wrapping the helpers they call. Stage times are exclusive: time
+# spent in station matching inside parse_report is counted under "match", not
+# under "regex".
+import os
+import sys
+import json
+import shutil
+import platform
+import subprocess
+import argparse
+import resource
+import tempfile
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import update_weather_summary as weather
+import update_hydro_summary as hydro
+from report_document import ReportDocument
+from report_manifest import file_sha256
+from report_pool import report_folders, report_pdf
+from run_metrics import RunMetrics
+from summary_table import add_stats, write_summary
+
+BENCH_VERSION = 1
+
+STAGES = ["open", "text", "sections", "regex", "match", "tables", "stats", "csv"]
+
+# Stages shorter than this (seconds, in the baseline) are too noisy to gate on
+NOISE_FLOOR = 0.05
+
+# Cold-import budgets (seconds, best of 3 fresh interpreters). meteo and
+# report_document must not pull in pandas, pdfplumber or camelot at import;
+# the summary scripts need pandas, but not camelot.
+IMPORT_BUDGETS = {
+    "meteo": 0.15,
+    "report_document": 0.15,
+    "update_weather_summary": 1.0,
+    "update_hydro_summary": 1.0,
+}
+
+class StageTimer(RunMetrics):
+    """RunMetrics stage timing with every benchmark stage reported, even if unused."""
+
+    def __init__(self):
+        super().__init__()
+        self.seconds.update({s: 0.0 for s in STAGES})
+
+    @property
+    def totals(self) -> Dict[str, float]:
+        return self.seconds
+
+    def wrap(self, name: str, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return timed
+
+@contextmanager
+def instrumented(timer: StageTimer):
+    """Swap the parsers' helpers for timed wrappers for the duration of the block."""
+    patches = [
+        (weather, "meteorological_block", "sections"),
+        (weather, "match_station", "match"),
+        (weather.station_matcher, "find_in", "match"),
+        (hydro, "pages_with_hydro", "sections"),
+        (hydro, "canon_station", "match"),
+    ]
+    saved = []
+    for obj, attr, stage in patches:
+        orig = getattr(obj, attr)
+        saved.append((obj, attr, orig, attr in vars(obj)))
+        setattr(obj, attr, timer.wrap(stage, orig))
+    try:
+        yield timer
+    finally:
+        for obj, attr, orig, had_own in reversed(saved):
+            if had_own:
+                setattr(obj, attr, orig)
+            else:
+                delattr(obj, attr)   # was a bound method from the class
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its children (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    scale = 1.0 / (1024 * 1024) if sys.platform == "darwin" else 1.0 / 1024
+    return round(max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                     resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * scale, 1)
+
+def import_seconds(module: str, repeat: int = 3) -> float:
+    """Cumulative `python -X importtime` for module in a fresh interpreter, best of `repeat`."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = float("inf")
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=here, capture_output=True, text=True, check=True)
+        for line in proc.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                best = min(best, int(parts[1]) / 1e6)
+    return round(best, 4)
+
+def check_imports(imports: Dict[str, float]) -> List[str]:
+    return [f"import {m}: {imports[m]:.3f}s > budget {b:.3f}s"
+            for m, b in IMPORT_BUDGETS.items() if imports.get(m, 0.0) > b]
+
+def sample_corpus(reports_dir: str, sample: int) -> List[str]:
+    """`sample` report folders evenly spaced over the archive (the same ones every run)."""
+    folders = report_folders(reports_dir)
+    if sample <= 0 or sample >= len(folders):
+        return folders
+    step = len(folders) / sample
+    return [folders[int(i * step)] for i in range(sample)]
+
+def bench_report(timer: StageTimer, date_folder: str, reports_dir: str,
+                 cache_dir: Optional[str], camelot: bool):
+    """Extract one report stage by stage; returns (weather rows, hydro row or None)."""
+    unmatched: List[str] = []
+    with timer.stage("open"):
+        doc = ReportDocument(report_pdf(reports_dir, date_folder), cache_dir=cache_dir)
+        doc.page_count
+        if cache_dir is None:
+            doc.pdf
+    try:
+        # pdfium pre-scan; only the pages it places a section on (and the header page) get laid out
+        with timer.stage("sections"):
+            index = doc.section_index()
+        with timer.stage("text"):
+            for i in sorted({0} | {int(band[0]) for bands in index.values() for band in bands}):
+                doc.page_text(i)
+                doc.page_words(i)
+
+        # Weather: PASS A / PASS B (all of parse_report not spent in matching or slicing)
+        with timer.stage("regex"):
+            rows = weather.parse_report(doc, date_folder, unmatched)
+
+        # Hydro: the same chain the pipeline uses (word boxes, then camelot, then text)
+        pages = hydro.pages_with_hydro(doc)
+        data: Dict[str, str] = {}
+        if pages:
+            with timer.stage("tables"):
+                data.update(hydro.parse_hydro_with_words(doc, pages))
+        if pages and camelot and not data:
+            with timer.stage("tables"):
+                data.update(hydro.parse_hydro_with_camelot(doc, pages))
+        if pages and not data:
+            with timer.stage("regex"):
+                data.update(hydro.parse_hydro_with_text(doc, pages))
+        hydro_row = None
+        if pages:
+            hydro_row = {"Date": doc.actual_date(date_folder)}
+            hydro_row.update({st: data.get(st, "") for st in hydro.STATIONS})
+    finally:
+        doc.close()
+    return rows, hydro_row
+
+def run_once(corpus: List[str], reports_dir: str, cache_dir: Optional[str], camelot: bool) -> dict:
+    timer = StageTimer()
+    per_pdf = []
+    weather_rows, hydro_rows = [], []
+    t0 = perf_counter()
+    with instrumented(timer):
+        for date_folder in corpus:
+            t = perf_counter()
+            rows, hydro_row = bench_report(timer, date_folder, reports_dir, cache_dir, camelot)
+            weather_rows.extend(rows)
+            if hydro_row:
+                hydro_rows.append(hydro_row)
+            per_pdf.append({"folder": date_folder, "seconds": round(perf_counter() - t, 4)})
+
+        with timer.stage("stats"):
+            w_df = pd.DataFrame(weather_rows).reindex(columns=["Date", "Type"] + weather.known_stations)
+            w_df = add_stats(w_df, weather.known_stations, {"Average": "mean", "Max": "max", "Min": "min"})
+            h_df = pd.DataFrame(hydro_rows).reindex(columns=["Date"] + hydro.STATIONS)
+            h_df = add_stats(h_df, hydro.STATIONS, {"Total": "sum", "Max": "max", "Min": "min"})
+
+        # Merge into copies of the real CSVs, so the write is the size it is in production
+        with tempfile.TemporaryDirectory() as tmp, timer.stage("csv"):
+            for src, df, keys, columns in (
+                    (weather.summary_file, w_df, ["Date", "Type"], weather.SUMMARY_COLUMNS),
+                    (hydro.OUTPUT_CSV, h_df, ["Date"], hydro.SUMMARY_COLUMNS)):
+                dst = os.path.join(tmp, os.path.basename(src))
+                if os.path.exists(src):
+                    shutil.copyfile(src, dst)
+                write_summary(dst, df, keys, columns, delta_dir=None)
+    total = perf_counter() - t0
+    return {
+        "total_s": round(total, 4),
+        "pdfs_per_sec": round(len(corpus) / total, 3) if total else None,
+        "stages": {k: round(v, 4) for k, v in timer.totals.items()},
+        "per_pdf": per_pdf,
+    }
+
+def benchmark(corpus: List[str], reports_dir: str = weather.reports_folder, repeat: int = 1,
+              cache_dir: Optional[str] = None, camelot: bool = True) -> dict:
+    """Run the corpus `repeat` times; keeps the fastest run and each stage's best time."""
+    runs = [run_once(corpus, reports_dir, cache_dir, camelot) for _ in range(max(repeat, 1))]
+    best = min(runs, key=lambda r: r["total_s"])
+    return {
+        "bench_version": BENCH_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "cache": "warm" if cache_dir else "off",
+        "camelot": bool(camelot and hydro.HAVE_CAMELOT),
+        "repeat": len(runs),
+        "corpus": [{"folder": d, "sha256": file_sha256(report_pdf(reports_dir, d))} for d in corpus],
+        "pdfs": len(corpus),
+        "total_s": best["total_s"],
+        "pdfs_per_sec": best["pdfs_per_sec"],
+        "stages": {s: min(r["stages"][s] for r in runs) for s in best["stages"]},
+        "peak_rss_mb": peak_rss_mb(),
+        "imports": {m: import_seconds(m) for m in IMPORT_BUDGETS},
+        "per_pdf": best["per_pdf"],
+    }
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    """Regressions of more than `threshold` (fraction) against baseline; empty when none."""
+    problems = []
+    if [c["sha256"] for c in result["corpus"]] != [c["sha256"] for c in baseline.get("corpus", [])]:
+        print("[bench] warning: corpus differs from the baseline's; comparison is approximate")
+    for key in ("cache", "camelot"):
+        if result.get(key) != baseline.get(key):
+            print(f"[bench] warning: {key}={result.get(key)} but baseline has {baseline.get(key)}")
+
+    checks = [("total_s", result["total_s"], baseline.get("total_s"))]
+    checks += [(f"stages.{s}", v, baseline.get("stages", {}).get(s)) for s, v in result["stages"].items()]
+    checks += [(f"imports.{m}", v, baseline.get("imports", {}).get(m)) for m, v in result["imports"].items()]
+    for name, new, old in checks:
+        if old is None or old < NOISE_FLOOR:
+            continue
+        change = (new - old) / old
+        if change > threshold:
+            problems.append(f"{name}: {old:.3f}s -> {new:.3f}s (+{change:.0%})")
+    old_rss = baseline.get("peak_rss_mb")
+    if old_rss and (result["peak_rss_mb"] - old_rss) / old_rss > threshold:
+        problems.append(f"peak_rss_mb: {old_rss} -> {result['peak_rss_mb']}")
+    return problems
+
+def print_report(result: dict) -> None:
+    print(f"[bench] {result['pdfs']} PDF(s), cache={result['cache']}, camelot={result['camelot']}, "
+          f"best of {result['repeat']}")
+    total = result["total_s"] or 1.0
+    for s, v in result["stages"].items():
+        print(f"  {s:<9}{v:9.3f}s  {v / total:6.1%}")
+    print(f"  {'total':<9}{result['total_s']:9.3f}s  {result['pdfs_per_sec']} PDFs/s  "
+          f"peak RSS {result['peak_rss_mb']} MB")
+    for m, v in result["imports"].items():
+        print(f"  import {m:<24}{v:7.3f}s  (budget {IMPORT_BUDGETS[m]:.2f}s)")
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Benchmark the weather/hydro extractors over a sample of reports/")
+    ap.add_argument("--reports-dir", default=weather.reports_folder)
+    ap.add_argument("--sample", type=int, default=20, help="evenly spaced report folders to use (0 = all)")
+    ap.add_argument("--corpus", help="file listing report folders, one per line (overrides --sample)")
+    ap.add_argument("--repeat", type=int, default=1, help="run the corpus N times and keep the best")
+    ap.add_argument("--warm-cache", action="store_true", help="read page text through the page cache")
+    ap.add_argument("--no-camelot", action="store_true", help="never fall back to camelot for the hydro section")
+    ap.add_argument("--out", help="result JSON (default: bench/<timestamp>.json)")
+    ap.add_argument("--baseline", help="earlier result JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown per stage/total (0.10 = 10%%)")
+    ap.add_argument("--import-budget", action="store_true",
+                    help="exit 1 if a module's cold import exceeds its IMPORT_BUDGETS entry")
+    args = ap.parse_args(argv)
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [ln.strip() for ln in f if ln.strip() and not ln.startswith("#")]
+    else:
+        corpus = sample_corpus(args.reports_dir, args.sample)
+
+    from page_cache import CACHE_DIR
+    import section_memo
+    section_memo.configure("")   # time the parsers, not memo lookups
+    result = benchmark(corpus, args.reports_dir, args.repeat,
+                       cache_dir=(CACHE_DIR or None) if args.warm_cache else None,
+                       camelot=not args.no_camelot)
+    print_report(result)
+
+    out = args.out or os.path.join("bench", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=1)
+        f.write("\n")
+    print(f"[bench] wrote {out}")
+
+    failed = False
+    if args.import_budget:
+        over = check_imports(result["imports"])
+        for p in over:
+            print(f"[bench] OVER BUDGET {p}")
+        failed = bool(over)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(result, json.load(f), args.threshold)
+        for p in problems:
+            print(f"[bench] REGRESSION {p}")
+        if not problems:
+            print(f"[bench] no regression above {args.threshold:.0%} against {args.baseline}")
+        failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+# cell_values.py — report cell text as the value written to the summary CSVs
+import re
+from functools import lru_cache
+
+NON_LETTER_RE = re.compile(r"[^A-Z]")
+NON_NUMBER_RE = re.compile(r"[^\d.]")
+
+# Reports repeat the same few hundred cell strings, so conversions are memoised
+@lru_cache(maxsize=4096)
+def safe_number(v, is_rainfall=False):
+    raw = str(v).strip()
+    up = raw.upper()
+    # normalize variants like "T R", "T.R" etc.
+    letters_only = NON_LETTER_RE.sub("", up)
+
+    if letters_only == "NA":
+        return "NA"
+    if letters_only in ("TR", "TRACE"):
+        return "0.01"
+
+    # dept sometimes prints dashes
+    if up in ["-", "--"]:
+        return "0.0" if is_rainfall else ""
+
+    # OCR fixes
+    cleaned = raw.replace("O", "0").replace("|", "1").replace("I", "1").replace("l", "1")
+    cleaned = NON_NUMBER_RE.sub("", cleaned)
+    if cleaned in ("", "."):
+        return ""
+
+    try:
+        f = float(cleaned)
+        if not is_rainfall and (f < -10 or f > 60):
+            return ""
+        return str(f)
+    except:
+        return ""
@@ -1,112 +1,388 @@
 import os
+import sys
 import time
+import json
 import tempfile
 import shutil
 import glob
+import hashlib
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import chromedriver_autoinstaller
-
-# === Auto-install matching ChromeDriver ===
-chromedriver_autoinstaller.install()
-
-# === CONFIG ===
-today = datetime.now().strftime('%Y-%m-%d')
-download_path = os.path.join(os.getcwd(), "downloads", today)
-os.makedirs(download_path, exist_ok=True)
-
-today_folder = os.path.join("reports", today)
-os.makedirs(today_folder, exist_ok=True)
-
-# === Chrome Options ===
-chrome_options = Options()
-chrome_options.add_argument("--headless=new")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_experimental_option("prefs", {
-    "download.default_directory": download_path,
-    "plugins.always_open_pdf_externally": True
-})
-
-temp_user_data_dir = tempfile.mkdtemp()
-chrome_options.add_argument(f"--user-data-dir={temp_user_data_dir}")
-
-# === Initialize Driver ===
-driver = webdriver.Chrome(options=chrome_options)
-driver.set_page_load_timeout(300)
-
-def wait_for_download(folder, timeout=120):
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urldefrag
+
+SITE_URL = "https://meteo.gov.lk/"
+REPORT_LINK_TEXT = "24 Hour Weather Report"
+MENU_TEXT = "Observation"
+# Menu entries worth following while looking for the report link (same ones the browser clicks)
+NAV_LINK_TEXTS = ("English", MENU_TEXT, REPORT_LINK_TEXT)
+
+STATE_FILE = os.path.join("reports", ".download_state.json")
+USER_AGENT = "meteo-weather-bot"
+
+class DownloadError(Exception):
+    pass
+
+# ------------------ HTTP ------------------
+
+class _LinkParser(HTMLParser):
+    """Collects (href, text) for every <a> in a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._href = dict(attrs).get("href")
+            self._text = []
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append((self._href, " ".join("".join(self._text).split())))
+            self._href = None
+
+def find_links(html, base_url):
+    """Absolute (url, text) pairs for the anchors in html."""
+    p = _LinkParser()
+    p.feed(html)
+    return [(urldefrag(urljoin(base_url, href))[0], text) for href, text in p.links if href]
+
+def make_session(retries=3, backoff=1.0, pool_size=8):
+    """Pooled session that retries connection errors, 429 and 5xx with exponential backoff."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=retries, backoff_factor=backoff,
+                  status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET", "HEAD"))
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+def _looks_like_pdf(url):
+    return url.lower().split("?", 1)[0].endswith(".pdf")
+
+def resolve_report_url(session, base_url=SITE_URL, max_pages=8, timeout=30,
+                       link_text=REPORT_LINK_TEXT, nav_texts=NAV_LINK_TEXTS):
+    """
+    Walk the site from base_url the way the browser flow does (English ->
+    Observation -> 24 Hour Weather Report, or another report's menu and link
+    text) using only the HTML, and return the URL of the report PDF. The
+    report link need not end in .pdf: a followed link the server answers
+    with a PDF is the report too (its body is not read here).
+    """
+    queue, seen = [base_url], set()
+    while queue and len(seen) < max_pages:
+        url = queue.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        with session.get(url, timeout=timeout, stream=True) as resp:
+            resp.raise_for_status()
+            ctype = resp.headers.get("Content-Type", "text/html")
+            if "pdf" in ctype:
+                return resp.url
+            if "html" not in ctype:
+                continue
+            html = resp.text
+        for href, text in find_links(html, resp.url):
+            if link_text.lower() in text.lower() and _looks_like_pdf(href):
+                return href
+            if any(t.lower() in text.lower() for t in nav_texts) and href not in seen:
+                queue.append(href)
+    raise DownloadError(f"No '{link_text}' PDF link found from {base_url}")
+
+def load_state(path=STATE_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+def fetch_pdf(session, url, dst, state, timeout=60, chunk_size=1 << 16):
+    """
+    Stream url into dst atomically. Sends If-None-Match / If-Modified-Since
+    from the last fetch of the same URL; returns False when the server (or the
+    content hash) says it is the report we already have.
+    """
+    prev = state.get(url, {})
+    headers = {}
+    if prev.get("etag"):
+        headers["If-None-Match"] = prev["etag"]
+    if prev.get("last_modified"):
+        headers["If-Modified-Since"] = prev["last_modified"]
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as resp:
+        if resp.status_code == 304:
+            print(f"Not modified since {prev.get('saved_as')}: {url}")
+            return False
+        resp.raise_for_status()
+
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".download-", suffix=".pdf", dir=os.path.dirname(dst))
+        h = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in resp.iter_content(chunk_size):
+                    f.write(chunk)
+                    h.update(chunk)
+            with open(tmp, "rb") as f:
+                if f.read(5) != b"%PDF-":
+                    raise DownloadError(f"{url} did not return a PDF")
+            sha256 = h.hexdigest()
+            if sha256 == prev.get("sha256") and prev.get("saved_as") != dst:
+                print(f"Same report as {prev.get('saved_as')}; not saving it again.")
+                os.remove(tmp)
+                return False
+            os.replace(tmp, dst)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    state[url] = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "sha256": sha256,
+        "saved_as": dst.replace(os.sep, "/"),
+    }
+    return True
+
+def download_report_http(reports_dir="reports", today=None, base_url=SITE_URL, session=None,
+                         link_text=REPORT_LINK_TEXT, menu_text=MENU_TEXT, prefix="weather", state=None):
+    """
+    Fetch today's report over plain HTTP; returns its path, or None if the
+    site still has the previous one. Given `state`, the caller loads and saves
+    it (download_all shares one between reports).
+    """
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    dst = os.path.join(reports_dir, today, f"{prefix}-{today}.pdf")
+    state_path = os.path.join(reports_dir, os.path.basename(STATE_FILE))
+    session = session or make_session()
+
+    url = resolve_report_url(session, base_url, link_text=link_text, nav_texts=("English", menu_text, link_text))
+    print(f"Report link: {url}")
+    own_state = state is None
+    if own_state:
+        state = load_state(state_path)
+    if not fetch_pdf(session, url, dst, state):
+        return None
+    if own_state:
+        save_state(state, state_path)
+    print(f"PDF successfully downloaded to: {dst}")
+    return dst
+
+# ------------------ Selenium (fallback) ------------------
+
+def make_driver(download_path):
+    """Headless Chrome that saves PDFs into download_path."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    import chromedriver_autoinstaller
+
+    # === Auto-install matching ChromeDriver ===
+    chromedriver_autoinstaller.install()
+
+    # === Chrome Options ===
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_experimental_option("prefs", {
+        "download.default_directory": download_path,
+        "plugins.always_open_pdf_externally": True
+    })
+
+    temp_user_data_dir = tempfile.mkdtemp()
+    chrome_options.add_argument(f"--user-data-dir={temp_user_data_dir}")
+
+    # === Initialize Driver ===
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.set_page_load_timeout(300)
+    return driver
+
+def wait_for_download(folder, timeout=120, before=()):
+    """PDFs that appear in folder (other than those in `before`) within timeout seconds."""
     end_time = time.time() + timeout
     while time.time() < end_time:
-        pdf_files = glob.glob(os.path.join(folder, "*.pdf"))
+        pdf_files = [f for f in glob.glob(os.path.join(folder, "*.pdf")) if f not in before]
         if pdf_files:
             return pdf_files
         time.sleep(1)
     return []
 
-try:
-    # === Open Website with Retry ===
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            driver.get("https://meteo.gov.lk/")
-            break
-        except Exception as e:
-            print(f"Attempt {attempt+1} failed: {e}")
-            if attempt == max_retries - 1:
-                raise
-            time.sleep(5)
+def download_report_selenium(reports_dir="reports", today=None, base_url=SITE_URL, link_text=REPORT_LINK_TEXT,
+                             menu_text=MENU_TEXT, prefix="weather", driver=None):
+    """
+    Click through the site in headless Chrome; returns the saved path or None.
+    Given `driver` (from make_driver on downloads/<today>), it is reused and
+    left open, so several reports share one browser.
+    """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    # === CONFIG ===
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    download_path = os.path.join(os.getcwd(), "downloads", today)
+    os.makedirs(download_path, exist_ok=True)
 
-    wait = WebDriverWait(driver, 20)
+    today_folder = os.path.join(reports_dir, today)
+    os.makedirs(today_folder, exist_ok=True)
 
-    # === Switch to English if button exists ===
+    own_driver = driver is None
+    if own_driver:
+        driver = make_driver(download_path)
+    before = set(glob.glob(os.path.join(download_path, "*.pdf")))
+    dst = None
     try:
-        english_link = wait.until(
-            EC.element_to_be_clickable((By.LINK_TEXT, "English"))
+        # === Open Website with Retry ===
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                driver.get(base_url)
+                break
+            except Exception as e:
+                print(f"Attempt {attempt+1} failed: {e}")
+                if attempt == max_retries - 1:
+                    raise
+                time.sleep(5)
+
+        wait = WebDriverWait(driver, 20)
+
+        # === Switch to English if button exists ===
+        try:
+            english_link = wait.until(
+                EC.element_to_be_clickable((By.LINK_TEXT, "English"))
+            )
+            english_link.click()
+            time.sleep(2)
+            print("Switched to English.")
+        except Exception:
+            print("English button not found, continuing...")
+
+        # === Click the menu (e.g. "Observation") ===
+        menu_button = wait.until(
+            EC.element_to_be_clickable((By.XPATH, f"//button[contains(text(),'{menu_text}')] | //a[contains(text(),'{menu_text}')]"))
         )
-        english_link.click()
-        time.sleep(2)
-        print("Switched to English.")
-    except Exception:
-        print("English button not found, continuing...")
-
-    # === Click "Observation" menu ===
-    observation_button = wait.until(
-        EC.element_to_be_clickable((By.XPATH, "//button[contains(text(),'Observation')] | //a[contains(text(),'Observation')]"))
-    )
-    observation_button.click()
-    print("Clicked Observation.")
-
-    # === Click "24 Hour Weather Report" submenu item ===
-    report_button = wait.until(
-        EC.element_to_be_clickable((By.XPATH, "//a[contains(text(),'24 Hour Weather Report')] | //button[contains(text(),'24 Hour Weather Report')]"))
-    )
-    report_button.click()
-    print("Clicked 24 Hour Weather Report submenu.")
-
-    # === Click the actual PDF link on the resulting page ===
-    pdf_link = wait.until(
-        EC.element_to_be_clickable((By.XPATH, "//a[contains(text(),'24 Hour Weather Report')]"))
-    )
-    pdf_link.click()
-    print("Clicked 24 Hour Weather Report PDF link.")
-
-    # === Wait for download ===
-    print("Waiting for PDF download to complete...")
-    pdf_files = wait_for_download(download_path, timeout=120)
-
-    if not pdf_files:
-        print("Download failed or timed out.")
-    else:
-        for file in pdf_files:
-            dst = os.path.join(today_folder, f"weather-{today}.pdf")
-            shutil.move(file, dst)
-        print(f"PDF successfully downloaded and moved to: {dst}")
-
-finally:
-    driver.quit()
-    print("Chrome closed.")
+        menu_button.click()
+        print(f"Clicked {menu_text}.")
+
+        # === Click the report's submenu item (e.g. "24 Hour Weather Report") ===
+        report_button = wait.until(
+            EC.element_to_be_clickable((By.XPATH, f"//a[contains(text(),'{link_text}')] | //button[contains(text(),'{link_text}')]"))
+        )
+        report_button.click()
+        print(f"Clicked {link_text} submenu.")
+
+        # === Click the actual PDF link on the resulting page ===
+        pdf_link = wait.until(
+            EC.element_to_be_clickable((By.XPATH, f"//a[contains(text(),'{link_text}')]"))
+        )
+        pdf_link.click()
+        print(f"Clicked {link_text} PDF link.")
+
+        # === Wait for download ===
+        print("Waiting for PDF download to complete...")
+        pdf_files = wait_for_download(download_path, timeout=120, before=before)
+
+        if not pdf_files:
+            print("Download failed or timed out.")
+        else:
+            for file in pdf_files:
+                dst = os.path.join(today_folder, f"{prefix}-{today}.pdf")
+                shutil.move(file, dst)
+            print(f"PDF successfully downloaded and moved to: {dst}")
+
+    finally:
+        if own_driver:
+            driver.quit()
+            print("Chrome closed.")
+    return dst
+
+def download_report(reports_dir="reports", today=None, base_url=SITE_URL, selenium=False):
+    """HTTP download by default; selenium=True uses the browser click-through instead."""
+    if selenium:
+        dst = download_report_selenium(reports_dir, today, base_url)
+        if dst is None:
+            raise DownloadError("Browser download failed or timed out")
+        return dst
+    try:
+        return download_report_http(reports_dir, today, base_url)
+    except DownloadError:
+        raise
+    except Exception as e:
+        raise DownloadError(f"HTTP download failed: {e}") from e
+
+def download_all(report_types, reports_dir="reports", today=None, base_url=SITE_URL, selenium=False):
+    """
+    Download today's PDF of every report type (see report_types.py) over one
+    HTTP session, concurrently, or one after the other in one browser with
+    selenium=True. Returns ({type name: path or None}, {type name: error}).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    paths, errors = {}, {}
+    if selenium:
+        driver = make_driver(os.path.join(os.getcwd(), "downloads", today))
+        try:
+            for rtype in report_types:
+                try:
+                    paths[rtype.name] = download_report_selenium(reports_dir, today, base_url, rtype.link_text,
+                                                                 rtype.menu_text, rtype.prefix, driver)
+                    if paths[rtype.name] is None:
+                        errors[rtype.name] = DownloadError("Browser download failed or timed out")
+                except Exception as e:
+                    errors[rtype.name] = DownloadError(f"Browser download failed: {e}")
+        finally:
+            driver.quit()
+            print("Chrome closed.")
+        return paths, errors
+
+    state_path = os.path.join(reports_dir, os.path.basename(STATE_FILE))
+    state = load_state(state_path)
+    session = make_session(pool_size=max(len(report_types), 1))
+
+    def one(rtype):
+        return download_report_http(reports_dir, today, base_url, session, rtype.link_text,
+                                    rtype.menu_text, rtype.prefix, state)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(len(report_types), 1)) as ex:
+            futures = {rtype.name: ex.submit(one, rtype) for rtype in report_types}
+        for name, future in futures.items():
+            try:
+                paths[name] = future.result()
+            except DownloadError as e:
+                errors[name] = e
+            except Exception as e:
+                errors[name] = DownloadError(f"HTTP download failed: {e}")
+    finally:
+        session.close()
+    save_state(state, state_path)
+    return paths, errors
+
+if __name__ == "__main__":
+    try:
+        download_report(selenium="--selenium" in sys.argv[1:])
+    except DownloadError as e:
+        print(e)
+        sys.exit(1)
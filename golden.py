@@ -0,0 +1,263 @@
+# golden.py — golden-output corpus from the summary CSVs, scored per extraction strategy
+#
+#   python golden.py build                   snapshot the CSV rows of every archived PDF into golden/
+#   python golden.py score [--sample 40]     cell accuracy and time per strategy, overall and per layout
+#
+# The golden rows are whatever weather_summary.csv / hydrocatchment_summary.csv
+# say today for each reports/<date> PDF, so `score` answers "does strategy X
+# reproduce the published summaries, and what does it cost". Strategies:
+#
+#   weather  pass_a   structured Station Max Min Rain capture only
+#            pass_b   line-wrap fallback only
+#            pass_ab  both, one after the other (the pipeline before the scanner)
+#            scan     RowScanner, both rules in one walk (what the pipeline runs)
+#   hydro    words    pdfplumber word-box geometry only
+#            lattice  camelot lattice only
+#            stream   camelot stream only
+#            text     regex over the page text only
+#            auto     words, then lattice, stream, text (what the pipeline runs)
+#
+# Page text and word boxes are extracted once per report before timing (every
+# strategy but camelot needs them, and the weather parser needs the text
+# anyway), so times are the strategies' own cost. "auto" is derived from the
+# runs it would make rather than run a second time.
+import os
+import re
+import sys
+import json
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, List
+
+import pandas as pd
+
+import update_weather_summary as weather
+import update_hydro_summary as hydro
+from report_document import ReportDocument
+from report_manifest import file_sha256
+from report_pool import report_folders, report_pdf
+from summary_table import read_summary
+
+GOLDEN_DIR = "golden"
+CORPUS_CSV = "corpus.csv"     # Folder, Date, sha256, Layout
+WEATHER_CSV = "weather.csv"   # Folder, Date, Type, stations...
+HYDRO_CSV = "hydro.csv"       # Folder, Date, stations...
+
+WEATHER_STRATEGIES = {"pass_a": "A", "pass_b": "B", "pass_ab": "AB", "scan": None}
+HYDRO_STRATEGIES = ["words", "lattice", "stream", "text", "auto"]
+PIPELINE = {"weather": "scan", "hydro": "auto"}
+
+def report_layout(doc: ReportDocument) -> str:
+    """Producer, paper size and page count, e.g. 'excel-2019/a4/1p' — the ways the archived reports differ."""
+    meta = doc.pdf.metadata or {}
+    producer = str(meta.get("Producer") or meta.get("Creator") or "unknown").lower().replace("microsoft", "")
+    producer = re.sub(r"[^a-z0-9]+", "-", producer).strip("-")[:24] or "unknown"
+    page = doc.page(0)
+    size = {(595, 842): "a4", (612, 792): "letter"}.get((round(page.width), round(page.height)),
+                                                        f"{round(page.width)}x{round(page.height)}")
+    return f"{producer}/{size}/{doc.page_count}p"
+
+# ------------------ build ------------------
+
+def build(reports_dir: str = weather.reports_folder, out_dir: str = GOLDEN_DIR) -> None:
+    """
+    Pair each archived PDF with its rows in the summary CSVs. Dates that more
+    than one folder resolves to are left out: the CSV only holds the last one.
+    """
+    corpus = []
+    for date_folder in report_folders(reports_dir):
+        pdf = report_pdf(reports_dir, date_folder)
+        with ReportDocument(pdf) as doc:
+            corpus.append({"Folder": date_folder, "Date": doc.actual_date(date_folder),
+                           "sha256": file_sha256(pdf), "Layout": report_layout(doc)})
+    corpus = pd.DataFrame(corpus)
+    corpus = corpus[~corpus["Date"].duplicated(keep=False)]
+
+    w = read_summary(weather.summary_file)
+    w = corpus[["Folder", "Date"]].merge(w.reindex(columns=["Date", "Type"] + weather.known_stations), on="Date")
+    h = read_summary(hydro.OUTPUT_CSV)
+    h = corpus[["Folder", "Date"]].merge(h.reindex(columns=["Date"] + hydro.STATIONS), on="Date")
+    corpus = corpus[corpus["Folder"].isin(set(w["Folder"]) | set(h["Folder"]))]
+
+    os.makedirs(out_dir, exist_ok=True)
+    corpus.to_csv(os.path.join(out_dir, CORPUS_CSV), index=False)
+    w.to_csv(os.path.join(out_dir, WEATHER_CSV), index=False)
+    h.to_csv(os.path.join(out_dir, HYDRO_CSV), index=False)
+    print(f"[golden] {len(corpus)} report(s), {len(w)} weather row(s), {len(h)} hydro row(s) -> {out_dir}/")
+
+# ------------------ score ------------------
+
+def load_golden(golden_dir: str = GOLDEN_DIR):
+    """(corpus, weather, hydro) frames with every cell as text."""
+    return tuple(read_summary(os.path.join(golden_dir, name)) for name in (CORPUS_CSV, WEATHER_CSV, HYDRO_CSV))
+
+def score_cells(expected: Dict[str, str], got: Dict[str, str], stations: List[str]) -> tuple:
+    """(cells, correct, filled cells, filled correct) for one golden row."""
+    cells = correct = filled = filled_ok = 0
+    for st in stations:
+        want, have = expected.get(st, ""), got.get(st, "")
+        cells += 1
+        correct += want == have
+        if want not in ("", "NA"):
+            filled += 1
+            filled_ok += want == have
+    return cells, correct, filled, filled_ok
+
+def run_weather(doc: ReportDocument, date_folder: str) -> Dict[str, tuple]:
+    """strategy -> ({Type: row}, seconds)."""
+    out = {}
+    for name, passes in WEATHER_STRATEGIES.items():
+        t = perf_counter()
+        rows = weather.parse_report(doc, date_folder, [], passes=passes)
+        out[name] = ({r["Type"]: r for r in rows}, perf_counter() - t)
+    return out
+
+def run_hydro(doc: ReportDocument) -> Dict[str, tuple]:
+    """strategy -> (station values, seconds)."""
+    pages = hydro.pages_with_hydro(doc)
+    out = {}
+    t = perf_counter()
+    out["words"] = (hydro.parse_hydro_with_words(doc, pages), perf_counter() - t)
+    for flavor in ("lattice", "stream"):
+        t = perf_counter()
+        out[flavor] = (hydro.parse_hydro_with_camelot(doc, pages, flavors=(flavor,)), perf_counter() - t)
+    t = perf_counter()
+    out["text"] = (hydro.parse_hydro_with_text(doc, pages), perf_counter() - t)
+
+    # auto = what hydro_row does: the first of these that yields anything
+    spent = 0.0
+    for name in ("words", "lattice", "stream", "text"):
+        data, secs = out[name]
+        spent += secs
+        if data or name == "text":
+            out["auto"] = (data, spent)
+            break
+    return out
+
+class Tally:
+    """Cell counts and time per (product, strategy, layout)."""
+
+    def __init__(self):
+        self.cells = defaultdict(lambda: [0, 0, 0, 0, 0.0, 0])   # cells, correct, filled, filled_ok, secs, reports
+
+    def add(self, key, counts, secs):
+        t = self.cells[key]
+        for i, n in enumerate(counts):
+            t[i] += n
+        t[4] += secs
+        t[5] += 1
+
+    def summary(self, key) -> dict:
+        cells, correct, filled, filled_ok, secs, reports = self.cells[key]
+        return {
+            "reports": reports,
+            "accuracy": round(correct / cells, 4) if cells else None,
+            "filled_accuracy": round(filled_ok / filled, 4) if filled else None,
+            "ms_per_report": round(1000 * secs / reports, 1) if reports else None,
+        }
+
+def score(golden_dir: str = GOLDEN_DIR, reports_dir: str = weather.reports_folder, sample: int = 40,
+          min_accuracy: float = 0.99) -> dict:
+    corpus, w_gold, h_gold = load_golden(golden_dir)
+    if 0 < sample < len(corpus):
+        step = len(corpus) / sample
+        corpus = corpus.iloc[[int(i * step) for i in range(sample)]]
+    w_gold = {(r["Folder"], r["Type"]): r for r in w_gold.to_dict("records")}
+    h_gold = {r["Folder"]: r for r in h_gold.to_dict("records")}
+
+    tally = Tally()
+    layouts = defaultdict(set)
+    for rec in corpus.to_dict("records"):
+        date_folder, layout = rec["Folder"], rec["Layout"]
+        pdf = report_pdf(reports_dir, date_folder)
+        if file_sha256(pdf) != rec["sha256"]:
+            print(f"[golden] {date_folder}: PDF changed since the golden build, skipped")
+            continue
+        print(f"[golden] {date_folder} ({layout})")
+        with ReportDocument(pdf) as doc:
+            for i in range(doc.page_count):
+                doc.page_text(i)
+                doc.page_words(i)
+            products = []
+            if any(k[0] == date_folder for k in w_gold):
+                products.append(("weather", run_weather(doc, date_folder)))
+            if date_folder in h_gold:
+                products.append(("hydro", run_hydro(doc)))
+            for product, results in products:
+                layouts[product].add(layout)
+                for strategy, (got, secs) in results.items():
+                    if product == "weather":
+                        counts = [0, 0, 0, 0]
+                        for typ in ("Max", "Min", "Rainfall"):
+                            want = w_gold.get((date_folder, typ))
+                            if want is not None:
+                                c = score_cells(want, got.get(typ, {}), weather.known_stations)
+                                counts = [a + b for a, b in zip(counts, c)]
+                    else:
+                        counts = score_cells(h_gold[date_folder], got, hydro.STATIONS)
+                    tally.add((product, strategy, None), counts, secs)
+                    tally.add((product, strategy, layout), counts, secs)
+
+    result = {"created": datetime.now().isoformat(timespec="seconds"), "golden_dir": golden_dir,
+              "min_accuracy": min_accuracy, "products": {}}
+    for product, strategies in (("weather", list(WEATHER_STRATEGIES)), ("hydro", HYDRO_STRATEGIES)):
+        overall = {s: tally.summary((product, s, None)) for s in strategies}
+        by_layout, best = {}, {}
+        for layout in sorted(layouts[product]):
+            by_layout[layout] = {s: tally.summary((product, s, layout)) for s in strategies}
+            ok = [s for s in strategies if (by_layout[layout][s]["accuracy"] or 0) >= min_accuracy]
+            best[layout] = min(ok, key=lambda s: by_layout[layout][s]["ms_per_report"]) if ok else None
+        result["products"][product] = {"overall": overall, "by_layout": by_layout, "cheapest_ok": best}
+    return result
+
+def print_score(result: dict) -> None:
+    for product, res in result["products"].items():
+        print(f"\n{product}: accuracy / filled-cell accuracy / ms per report")
+        for s, v in res["overall"].items():
+            print(f"  {s:<9}{v['accuracy'] or 0:8.2%} {v['filled_accuracy'] or 0:8.2%} {v['ms_per_report'] or 0:9.1f}")
+        for layout, strategies in res["by_layout"].items():
+            n = next(iter(strategies.values()))["reports"]
+            print(f"  {layout} ({n} report(s)) -> cheapest >= {result['min_accuracy']:.0%}: "
+                  f"{res['cheapest_ok'][layout] or 'none'}")
+            for s, v in strategies.items():
+                print(f"    {s:<9}{v['accuracy'] or 0:8.2%} {v['filled_accuracy'] or 0:8.2%} {v['ms_per_report'] or 0:9.1f}")
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="Golden-output corpus and per-strategy accuracy for the extractors")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="snapshot the summary CSV rows of every archived PDF")
+    p.add_argument("--dir", default=GOLDEN_DIR)
+    p = sub.add_parser("score", help="score every strategy against the golden rows")
+    p.add_argument("--dir", default=GOLDEN_DIR)
+    p.add_argument("--sample", type=int, default=40, help="evenly spaced golden reports to score (0 = all)")
+    p.add_argument("--min-accuracy", type=float, default=0.99,
+                   help="cell accuracy a strategy must reach to be recommended (default 0.99)")
+    p.add_argument("--out", help="result JSON (default: bench/golden-<timestamp>.json)")
+    args = ap.parse_args(argv)
+    import section_memo
+    section_memo.configure("")   # score and time the parsers themselves
+
+    if args.command == "build":
+        build(out_dir=args.dir)
+        return
+
+    result = score(args.dir, sample=args.sample, min_accuracy=args.min_accuracy)
+    print_score(result)
+    out = args.out or os.path.join("bench", "golden-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=1)
+        f.write("\n")
+    print(f"\n[golden] wrote {out}")
+
+    # The pipeline's own strategies falling below the bar is a regression
+    failed = [p for p, s in PIPELINE.items()
+              if (result["products"][p]["overall"][s]["accuracy"] or 0) < args.min_accuracy]
+    if failed:
+        print(f"[golden] REGRESSION: {', '.join(failed)} below {args.min_accuracy:.0%} cell accuracy")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# history_store.py — optional Parquet history behind the summary CSVs
+#
+# Layout: <root>/<product>/year=YYYY/month=MM/<YYYY-MM-DD>.parquet, one file per
+# report date in long form (date, type, station, value, flag, check). Adding a
+# day writes one small file; re-parsing a day replaces just that file. `check`
+# holds the validation.py checks that flagged the cell ("jump", ...), if any.
+import os, warnings
+import importlib.util
+import pandas as pd
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# pyarrow is only imported once a store is used; the cell codecs below do not need it
+HAVE_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Cell semantics kept explicit instead of overloading the CSV text
+FLAG_VALUE   = "value"     # numeric reading
+FLAG_TRACE   = "trace"     # TR / TRACE, stored as 0.01
+FLAG_NA      = "na"        # report printed NA, or the whole day is missing
+FLAG_MISSING = "missing"   # nothing parsed for this station
+
+TRACE_VALUE = 0.01
+
+@lru_cache(maxsize=None)
+def arrow():
+    """(pyarrow, pyarrow.dataset, pyarrow.parquet, SCHEMA), imported on first use."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    schema = pa.schema([
+        ("date", pa.date32()),
+        ("type", pa.string()),
+        ("station", pa.string()),
+        ("value", pa.float64()),
+        ("flag", pa.string()),
+        ("check", pa.string()),
+    ])
+    return pa, ds, pq, schema
+
+def encode_cell(text) -> tuple:
+    """CSV cell text -> (value, flag)."""
+    raw = "" if text is None else str(text).strip()
+    if raw == "" or raw.lower() == "nan":
+        return None, FLAG_MISSING
+    if raw.upper() == "NA":
+        return None, FLAG_NA
+    try:
+        v = float(raw)
+    except ValueError:
+        return None, FLAG_MISSING
+    return v, (FLAG_TRACE if v == TRACE_VALUE else FLAG_VALUE)
+
+def decode_cell(value, flag) -> str:
+    """(value, flag) -> CSV cell text, the inverse of encode_cell."""
+    if flag == FLAG_NA:
+        return "NA"
+    if flag in (FLAG_VALUE, FLAG_TRACE) and value is not None and not pd.isna(value):
+        return str(float(value))
+    return ""
+
+class HistoryStore:
+    """
+    Parquet dataset for one product ("weather", "hydro"). Rows go in and come
+    out in the same wide shape the summary scripts use; `type_key` is the
+    row-type column ("Type" for weather, None for hydro).
+    """
+
+    def __init__(self, root: str, product: str, stations: List[str], type_key: Optional[str] = None):
+        if not HAVE_ARROW:
+            raise RuntimeError("pyarrow is required for the history store (pip install pyarrow)")
+        self.root = os.path.join(root, product)
+        self.stations = list(stations)
+        self.type_key = type_key
+
+    def day_path(self, date: str) -> str:
+        y, m, _ = date.split("-")
+        return os.path.join(self.root, f"year={y}", f"month={m}", f"{date}.parquet")
+
+    def write_rows(self, rows: List[Dict], checks: Optional[Dict[tuple, str]] = None) -> List[str]:
+        """
+        Replace the stored day for every date in rows (last row per key wins),
+        with `checks` (see validation.cell_checks) on the flagged cells.
+        Returns dates written.
+        """
+        checks = checks or {}
+        by_date: Dict[str, Dict[str, Dict]] = {}
+        for r in rows:
+            by_date.setdefault(r["Date"], {})[r.get(self.type_key, "") if self.type_key else ""] = r
+
+        pa, _, pq, schema = arrow()
+        for date, typed in sorted(by_date.items()):
+            recs = {"date": [], "type": [], "station": [], "value": [], "flag": [], "check": []}
+            day = pd.Timestamp(date).date()
+            for typ, r in typed.items():
+                for st in self.stations:
+                    value, flag = encode_cell(r.get(st, ""))
+                    recs["date"].append(day)
+                    recs["type"].append(typ or None)
+                    recs["station"].append(st)
+                    recs["value"].append(value)
+                    recs["flag"].append(flag)
+                    recs["check"].append(checks.get((date, typ or "", st)))
+            path = self.day_path(date)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            pq.write_table(pa.Table.from_pydict(recs, schema=schema), tmp)
+            os.replace(tmp, path)
+        return sorted(by_date)
+
+    def read_long(self, since: Optional[str] = None, until: Optional[str] = None) -> pd.DataFrame:
+        """
+        Typed long table, optionally limited to a date range. The range is
+        also put on the year=/month= partition keys, so files of months
+        outside it are never opened.
+        """
+        pa, ds, _, schema = arrow()
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=schema.names)
+        keys = pa.schema([("year", pa.int32()), ("month", pa.int32())])
+        dataset = ds.dataset(self.root, format="parquet", schema=pa.unify_schemas([schema, keys]),
+                             partitioning=ds.partitioning(keys, flavor="hive"), exclude_invalid_files=True)
+        year, month = ds.field("year"), ds.field("month")
+        flt = None
+        if since:
+            d = pd.Timestamp(since)
+            flt = (((year > d.year) | ((year == d.year) & (month >= d.month)))
+                   & (ds.field("date") >= pa.scalar(d.date())))
+        if until:
+            d = pd.Timestamp(until)
+            upper = (((year < d.year) | ((year == d.year) & (month <= d.month)))
+                     & (ds.field("date") <= pa.scalar(d.date())))
+            flt = upper if flt is None else (flt & upper)
+        return dataset.to_table(columns=schema.names, filter=flt).to_pandas()
+
+    def read_wide(self, since: Optional[str] = None, until: Optional[str] = None) -> pd.DataFrame:
+        """History in the CSV's shape: Date[, Type], stations... as CSV cell text, sorted by key."""
+        long = self.read_long(since, until)
+        keys = ["Date"] + ([self.type_key] if self.type_key else [])
+        if long.empty:
+            return pd.DataFrame(columns=keys + self.stations)
+        long["Date"] = pd.to_datetime(long["date"]).dt.strftime("%Y-%m-%d")
+        if self.type_key:
+            long[self.type_key] = long["type"]
+        long["cell"] = [decode_cell(v, f) for v, f in zip(long["value"].tolist(), long["flag"].tolist())]
+        wide = long.pivot(index=keys, columns="station", values="cell").reset_index()
+        wide.columns.name = None
+        return wide.reindex(columns=keys + self.stations).fillna("").sort_values(keys, ignore_index=True)
+
+    def import_frame(self, df: pd.DataFrame) -> int:
+        """Load an existing summary CSV (as read by summary_table.read_summary) into the store."""
+        rows = df.to_dict("records")
+        return len(self.write_rows(rows))
@@ -0,0 +1,92 @@
+# local_site.py — offline stand-in for meteo.gov.lk, serving fixture HTML and the PDFs in reports/
+#
+#   python local_site.py --date 2025-06-20 --port 8000
+#   python meteo.py download --base-url http://127.0.0.1:8000/ --date 2025-06-20
+#
+# Serves the same navigation the downloader follows (English -> Observation ->
+# 24 Hour Weather Report -> PDF) and answers If-None-Match / If-Modified-Since
+# with 304, so conditional requests can be exercised too.
+import os
+import argparse
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+INDEX_HTML = """<html><body>
+<a href="/en">English</a>
+<nav><button>Observation</button>
+  <ul><li><a href="/en/observation/24-hour-weather-report">24 Hour Weather Report</a></li></ul>
+</nav></body></html>"""
+
+REPORT_PAGE_HTML = """<html><body>
+<h1>Observation</h1>
+<a href="/files/weather-{date}.pdf">24 Hour Weather Report</a>
+</body></html>"""
+
+def make_handler(reports_dir, date):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, body=b"", ctype="text/html; charset=utf-8", headers=None):
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path in ("/", "/en"):
+                return self._send(200, INDEX_HTML.encode())
+            if path == "/en/observation/24-hour-weather-report":
+                return self._send(200, REPORT_PAGE_HTML.format(date=self.server.date).encode())
+            if path.startswith("/files/weather-") and path.endswith(".pdf"):
+                d = path[len("/files/weather-"):-len(".pdf")]
+                pdf = os.path.join(reports_dir, d, f"weather-{d}.pdf")
+                if not os.path.exists(pdf):
+                    return self._send(404, b"not found", "text/plain")
+                with open(pdf, "rb") as f:
+                    body = f.read()
+                mtime = os.path.getmtime(pdf)
+                etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+                headers = {"ETag": etag, "Last-Modified": formatdate(mtime, usegmt=True)}
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, headers=headers)
+                ims = self.headers.get("If-Modified-Since")
+                if ims and not self.headers.get("If-None-Match"):
+                    try:
+                        if int(mtime) <= parsedate_to_datetime(ims).timestamp():
+                            return self._send(304, headers=headers)
+                    except (TypeError, ValueError):
+                        pass
+                return self._send(200, body, "application/pdf", headers)
+            return self._send(404, b"not found", "text/plain")
+
+        def log_message(self, fmt, *args):
+            print("[local_site] " + fmt % args)
+
+    return Handler
+
+def make_server(reports_dir="reports", date=None, host="127.0.0.1", port=8000):
+    """Server whose '24 Hour Weather Report' link points at reports/<date>; port 0 picks a free one."""
+    date = date or sorted(os.listdir(reports_dir))[-1]
+    server = ThreadingHTTPServer((host, port), make_handler(reports_dir, date))
+    server.date = date
+    return server
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Serve a stand-in meteo.gov.lk from reports/")
+    ap.add_argument("--reports-dir", default="reports")
+    ap.add_argument("--date", help="report the site links to (default: newest folder)")
+    ap.add_argument("--port", type=int, default=8000)
+    args = ap.parse_args(argv)
+    server = make_server(args.reports_dir, args.date, port=args.port)
+    print(f"[local_site] http://127.0.0.1:{server.server_address[1]}/ -> {server.date}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
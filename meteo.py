@@ -0,0 +1,240 @@
+# meteo.py — single entry point for the bot: download, extract, backfill
+#
+#   python meteo.py download            fetch today's reports into reports/<date>/
+#   python meteo.py extract             update weather, hydro and rainfall summaries in one pass per PDF
+#   python meteo.py backfill --since D  re-extract reports/<date> folders in a date range
+#   python meteo.py backfill --url-template URL  fetch missing reports, then extract just those
+#   python meteo.py history import|export  seed the Parquet history from the CSVs / re-export them
+#   python meteo.py compact             re-sort the summaries and prune old per-day delta files
+#   python meteo.py outputs             list the output paths the workflow commits
+#
+# Every command works on the report types in report_types.py (--types picks
+# some). The extractors (pandas, pdfplumber, ...) are imported by the commands that
+# use them, so `download` starts without loading any of them.
+import os
+import sys
+import argparse
+from typing import List, Optional
+
+from report_pool import chunked, map_reports
+from run_metrics import MetricsLog, activated, collecting, count, stage
+from download_weather_pdf import SITE_URL
+
+REPORTS_DIR = "reports"
+HISTORY_DIR = "history"
+
+def extract_folder(job):
+    """
+    (report type, date_folder, product names) -> ({product: parse result},
+    metrics). Runs in worker processes; opens the PDF once for all products.
+    """
+    from report_document import ReportDocument
+    from report_types import REPORT_TYPES
+    type_name, date_folder, wanted = job
+    rtype = REPORT_TYPES[type_name]
+    with collecting(date_folder) as metrics, \
+            ReportDocument(rtype.pdf(REPORTS_DIR, date_folder), markers=rtype.markers) as doc:
+        results = {name: rtype.product(name).parse(doc, date_folder) for name in wanted}
+    return results, metrics.as_dict()
+
+def extract(folders: Optional[List[str]] = None, full_rebuild: bool = False, workers: int = 1,
+            history: Optional[str] = None, chunk_size: int = 0, log: Optional[MetricsLog] = None,
+            types: Optional[str] = None) -> None:
+    """
+    Parse every report that any summary still needs, opening each PDF once
+    for all the products of its report type (see report_types.py; `types`
+    picks them, default every enabled one), then merge into each product's
+    summary CSV and update its manifest. All types share one worker pool.
+    With `history`, new weather and hydro days go into the Parquet store
+    there and those CSVs are exported from it.
+    With `chunk_size`, rows are merged and the manifests saved every that many
+    reports, so memory stays flat however long the archive is. Per-report
+    metrics go to `log` when given.
+    """
+    from report_manifest import ReportManifest, summary_dates
+    from report_types import REPORT_TYPES, enabled_types
+    rtypes = enabled_types(types)
+    products = [p for rtype in rtypes for p in rtype.products]
+    manifests = {p.name: ReportManifest(p.manifest_json, p.parser_version) for p in products}
+    known = {p.name: None if full_rebuild else summary_dates(p.summary_csv) for p in products}
+    for p in products:
+        p.begin(history)
+
+    jobs = []
+    for rtype in rtypes:
+        for date_folder in (folders if folders is not None else rtype.folders(REPORTS_DIR)):
+            pdf = rtype.pdf(REPORTS_DIR, date_folder)
+            if not os.path.exists(pdf):
+                continue
+            wanted = tuple(p.name for p in rtype.products
+                           if known[p.name] is None or not manifests[p.name].is_current(pdf, known[p.name]))
+            if wanted:
+                jobs.append((rtype.name, date_folder, wanted))
+
+    print(f"[extract] {len(jobs)} report(s) to parse")
+
+    chunks = chunked(jobs, chunk_size)
+    for n, chunk in enumerate(chunks, 1):
+        parsed = {p.name: [] for p in products}
+        for (type_name, date_folder, wanted), (results, metrics) in zip(
+                chunk, map_reports(extract_folder, chunk, workers)):
+            rtype = REPORT_TYPES[type_name]
+            pdf = rtype.pdf(REPORTS_DIR, date_folder)
+            print(f"Processing: {pdf}")
+            if log is not None:
+                log.report(date_folder, metrics, report=type_name,
+                           **{p.name: p.name in wanted for p in rtype.products})
+            for name in wanted:
+                parsed[name].append((pdf, rtype.product(name).collect(date_folder, results[name])))
+
+        # Products save in registry order; weather fills date gaps only on the last chunk
+        for p in products:
+            p.save(last=n == len(chunks))
+
+        for p in products:
+            manifest = manifests[p.name]
+            for pdf, dates in parsed[p.name]:
+                manifest.record(pdf, dates)
+            manifest.prune()
+            manifest.save()
+
+    for p in products:
+        p.finish()
+
+def cmd_download(args, log: MetricsLog) -> None:
+    from download_weather_pdf import download_all
+    from report_types import enabled_types
+    with stage("download"):
+        paths, errors = download_all(enabled_types(args.types), REPORTS_DIR, today=args.date,
+                                     base_url=args.base_url, selenium=args.selenium)
+    for path in paths.values():
+        count("downloads" if path else "downloads_unchanged")
+    for name, e in errors.items():
+        print(f"[download] {name}: {e}")
+        count("download_errors")
+    if errors:
+        log.close()
+        sys.exit(1)
+
+def sync_db(path: Optional[str]) -> None:
+    """Bring the SQLite read store at path (if any) up to date with the CSVs just written."""
+    if path:
+        from summary_db import SummaryDB, sync_all
+        db = SummaryDB(path)
+        sync_all(db)
+        db.close()
+
+def cmd_extract(args, log: MetricsLog) -> None:
+    extract(full_rebuild=args.full_rebuild, workers=args.workers, history=args.history,
+            chunk_size=args.chunk_size, log=log, types=args.types)
+    sync_db(args.db)
+
+def cmd_backfill(args, log: MetricsLog) -> None:
+    from report_types import enabled_types
+    rtypes = enabled_types(args.types)
+    if args.url_template:
+        from backfill import backfill_downloads
+        if len(rtypes) != 1:
+            raise SystemExit("--url-template fetches one report type; pick it with --types")
+        rtype = rtypes[0]
+        summaries = {p.summary_csv: p.stations for p in rtype.products if p.stations}
+        with stage("download"):
+            fetched = backfill_downloads(args.url_template, REPORTS_DIR, summaries, args.since, args.until,
+                                         args.concurrency, args.rate, args.retry_missing, rtype.prefix)
+        count("downloads", len(fetched))
+        if fetched:
+            extract(fetched, workers=args.workers, history=args.history, chunk_size=args.chunk_size, log=log,
+                    types=rtype.name)
+            sync_db(args.db)
+        return
+    folders = sorted({d for rtype in rtypes for d in rtype.folders(REPORTS_DIR)
+                      if (not args.since or d >= args.since) and (not args.until or d <= args.until)})
+    extract(folders, full_rebuild=True, workers=args.workers, history=args.history,
+            chunk_size=args.chunk_size, log=log, types=args.types)
+    sync_db(args.db)
+
+def cmd_history(args, log: MetricsLog) -> None:
+    from report_types import enabled_types
+    from summary_table import read_summary
+    for p in (p for rtype in enabled_types(args.types) for p in rtype.products if p.history):
+        store = p.mod.history_store(args.dir)
+        if args.action == "import":
+            n = store.import_frame(read_summary(p.summary_csv))
+            print(f"[history] {p.summary_csv}: {n} day(s) -> {store.root}")
+        else:
+            p.mod.export_history(store)
+
+def cmd_compact(args, log: MetricsLog) -> None:
+    from report_types import enabled_types
+    from summary_table import compact_summary
+    for p in (p for rtype in enabled_types(args.types) for p in rtype.products):
+        with stage("write"):
+            removed = compact_summary(p.summary_csv, p.keys, p.columns, keep_days=args.keep_days)
+        print(f"[compact] {p.summary_csv}: {removed} delta file(s) removed")
+
+def cmd_outputs(args, log: MetricsLog) -> None:
+    from report_types import enabled_types
+    # Only paths that exist, so `git add` on the list never fails on one not written yet
+    paths = [path for rtype in enabled_types(args.types) for p in rtype.products for path in p.outputs()]
+    print("\n".join(path for path in dict.fromkeys(paths) if os.path.exists(path)))
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(prog="meteo", description="meteo.gov.lk daily weather report bot")
+    ap.add_argument("--metrics", metavar="FILE", default=os.environ.get("METEO_METRICS"),
+                    help="append per-report and per-run metrics as JSON lines (default: $METEO_METRICS)")
+    ap.add_argument("--types", default=os.environ.get("METEO_REPORT_TYPES"),
+                    help="comma-separated report types from report_types.py (default: $METEO_REPORT_TYPES, "
+                         "else every enabled one)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("download", help="download today's report of every type (24 Hour Weather Report, ...)")
+    p.add_argument("--selenium", action="store_true", help="use the headless-Chrome click-through instead of HTTP")
+    p.add_argument("--base-url", default=SITE_URL, help="site to resolve the report link from (e.g. a local stand-in)")
+    p.add_argument("--date", help="report folder date (default: today)")
+    p.set_defaults(func=cmd_download)
+
+    p = sub.add_parser("extract", help="update each report type's summaries (weather, hydrocatchment, rainfall, ...)")
+    p.add_argument("--full-rebuild", action="store_true", help="ignore the manifests and re-parse every report")
+    p.add_argument("--workers", type=int, default=1, help="parse reports in N processes (0 = one per CPU)")
+    p.add_argument("--history", metavar="DIR", help="keep the Parquet history in DIR and export the CSVs from it")
+    p.add_argument("--chunk-size", type=int, default=0,
+                   help="merge into the CSVs every N reports to bound memory (0 = all at once)")
+    p.add_argument("--db", metavar="FILE", help="also update the SQLite read store in FILE (see summary_db.py)")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("backfill", help="re-extract a date-folder range, or fetch missing reports with --url-template")
+    p.add_argument("--since", help="first reports/<YYYY-MM-DD> folder to include")
+    p.add_argument("--until", help="last reports/<YYYY-MM-DD> folder to include")
+    p.add_argument("--url-template", default=os.environ.get("METEO_ARCHIVE_URL"),
+                   help="archive URL with a {date} placeholder (default: $METEO_ARCHIVE_URL); "
+                        "fetch the missing dates and extract only those")
+    p.add_argument("--concurrency", type=int, default=4, help="downloads in flight at once")
+    p.add_argument("--rate", type=float, default=2.0, help="max download starts per second")
+    p.add_argument("--retry-missing", action="store_true", help="retry dates the server previously had no report for")
+    p.add_argument("--workers", type=int, default=1, help="parse reports in N processes (0 = one per CPU)")
+    p.add_argument("--history", metavar="DIR", help="keep the Parquet history in DIR and export the CSVs from it")
+    p.add_argument("--chunk-size", type=int, default=0,
+                   help="merge into the CSVs every N reports to bound memory (0 = all at once)")
+    p.add_argument("--db", metavar="FILE", help="also update the SQLite read store in FILE (see summary_db.py)")
+    p.set_defaults(func=cmd_backfill)
+
+    p = sub.add_parser("history", help="seed the Parquet history from the CSVs, or re-export the CSVs from it")
+    p.add_argument("action", choices=["import", "export"])
+    p.add_argument("--dir", default=HISTORY_DIR, help=f"history directory (default: {HISTORY_DIR})")
+    p.set_defaults(func=cmd_history)
+
+    p = sub.add_parser("compact", help="rewrite the summaries sorted and drop old per-day delta files")
+    p.add_argument("--keep-days", type=int, default=30, help="keep delta files for this many days (default: 30)")
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser("outputs", help="list the existing summary, manifest, registry, delta and quality paths")
+    p.set_defaults(func=cmd_outputs)
+
+    args = ap.parse_args(argv)
+    log = MetricsLog(args.metrics, args.command)
+    with activated(log.metrics):
+        args.func(args, log)
+    log.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# ocr.py — OCR fallback for report pages whose text layer is missing or unusable
+#
+# Regions are rendered with pdfium (already a pdfplumber dependency, so no
+# poppler/pdf2image needed) and read with tesseract. Only the regions asked for
+# are rasterised: whole pages when a page has no text layer at all, otherwise
+# just the bands of the section that parsed to nothing. Results are cached per
+# PDF hash in the page cache, so a scanned report is OCR'd once.
+import multiprocessing
+import os
+import shutil
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import pypdfium2 as pdfium
+
+from report_pool import map_reports
+
+try:
+    import pytesseract
+    HAVE_TESSERACT = True
+except Exception:
+    HAVE_TESSERACT = False
+
+# 300 dpi puts the reports' ~8pt table text at the glyph height tesseract reads best
+OCR_DPI = int(os.environ.get("METEO_OCR_DPI", "300"))
+OCR_LANG = os.environ.get("METEO_OCR_LANG", "eng")
+OCR_WORKERS = int(os.environ.get("METEO_OCR_WORKERS", "0"))   # 0 = one per CPU
+# Block mode keeps each table row on one line, across columns, as the text parsers expect
+OCR_CONFIG = "--psm 6"
+
+Region = Tuple[int, Optional[Tuple[float, float]]]   # (0-based page, (top, bottom) band or None for the whole page)
+
+def ocr_available() -> bool:
+    return HAVE_TESSERACT and shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+@lru_cache(maxsize=None)
+def ocr_version() -> str:
+    """Cache key part: a different engine, language or resolution means different output. Asked once per process."""
+    return f"tesseract-{pytesseract.get_tesseract_version()}:{OCR_LANG}:{OCR_DPI}dpi:{OCR_CONFIG}"
+
+def region_key(region: Region) -> str:
+    page, band = region
+    return str(page) if band is None else f"{page}:{band[0]:.2f}-{band[1]:.2f}"
+
+def ocr_region(job) -> List[Dict]:
+    """
+    (pdf path, page, band, dpi, lang) -> word boxes in the page's own
+    top-down points, like ReportDocument.page_words. Runs in worker processes.
+    """
+    path, page_no, band, dpi, lang = job
+    scale = dpi / 72.0
+    pdf = pdfium.PdfDocument(path)
+    try:
+        page = pdf[page_no]
+        height = page.get_height()
+        top, bottom = band if band is not None else (0.0, height)
+        # crop = points trimmed from (left, bottom, right, top)
+        image = page.render(scale=scale, crop=(0, height - bottom, 0, top), grayscale=True).to_pil()
+        page.close()
+    finally:
+        pdf.close()
+
+    data = pytesseract.image_to_data(image, lang=lang, config=OCR_CONFIG, output_type=pytesseract.Output.DICT)
+    words = []
+    for k, text in enumerate(data["text"]):
+        text = text.strip()
+        if not text:
+            continue
+        x, y, w, h = data["left"][k], data["top"][k], data["width"][k], data["height"][k]
+        words.append({"text": text,
+                      "x0": round(x / scale, 2), "x1": round((x + w) / scale, 2),
+                      "top": round(top + y / scale, 2), "bottom": round(top + (y + h) / scale, 2)})
+    return words
+
+def ocr_regions(path: str, regions: List[Region], cache=None, workers: int = OCR_WORKERS) -> Dict[Region, List[Dict]]:
+    """
+    OCR word boxes for each region, from the page cache where possible and
+    otherwise across a process pool. Inside an extract worker the regions are
+    read serially instead, so workers never start pools of their own. Empty
+    when tesseract is not installed.
+    """
+    if not ocr_available():
+        print(f"[ocr] {path}: text layer missing or unusable, but tesseract is not installed; skipping OCR")
+        return {}
+    version = ocr_version()
+    found: Dict[Region, List[Dict]] = {}
+    todo = []
+    for region in regions:
+        words = cache.ocr(version, region_key(region)) if cache is not None else None
+        if words is None:
+            todo.append(region)
+        else:
+            found[region] = words
+    if todo:
+        print(f"[ocr] {path}: {len(todo)} region(s) at {OCR_DPI} dpi")
+    jobs = [(path, page, band, OCR_DPI, OCR_LANG) for page, band in todo]
+    if multiprocessing.parent_process() is not None:
+        workers = 1
+    for region, words in zip(todo, map_reports(ocr_region, jobs, workers)):
+        found[region] = words
+        if cache is not None:
+            cache.set_ocr(version, region_key(region), words)
+    return found
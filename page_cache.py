@@ -0,0 +1,111 @@
+# page_cache.py — on-disk cache of extracted page text / word boxes / section index / OCR, keyed by PDF content
+import os, json
+from functools import lru_cache
+from importlib.metadata import version
+from typing import Dict, List, Optional
+from report_manifest import file_sha256
+
+# Set METEO_CACHE_DIR="" to disable the cache
+CACHE_DIR = os.environ.get("METEO_CACHE_DIR", os.path.join(".cache", "pages"))
+
+@lru_cache(maxsize=None)
+def extractor_version() -> str:
+    """
+    Any upgrade of the text extractor can change extract_text() output, so it
+    is part of the key. Read from package metadata, so a fully cached report
+    never imports pdfplumber.
+    """
+    return f"pdfplumber-{version('pdfplumber')}+pdfminer-{version('pdfminer.six')}"
+
+WORD_KEYS = ("text", "x0", "x1", "top", "bottom")
+
+class PageCache:
+    """
+    One JSON file per PDF, named after its sha256, holding per-page text and
+    word boxes. A changed PDF gets a new file; a different extractor version
+    ignores the old one. Loaded on first use, written back by save().
+    """
+
+    def __init__(self, pdf_path: str, cache_dir: str = CACHE_DIR, sha256: Optional[str] = None):
+        self.pdf_path = pdf_path
+        self.cache_dir = cache_dir
+        self._sha256 = sha256
+        self._data: Optional[dict] = None
+        self.dirty = False
+
+    @property
+    def path(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = file_sha256(self.pdf_path)
+        return os.path.join(self.cache_dir, f"{self._sha256}.json")
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = {"extractor": extractor_version(), "page_count": None, "pages": {}}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        cached = json.load(f)
+                    if cached.get("extractor") == extractor_version():
+                        self._data = cached
+                except Exception:
+                    pass  # unreadable cache file: rebuild it
+        return self._data
+
+    def _page(self, i: int) -> dict:
+        return self.data["pages"].setdefault(str(i), {})
+
+    def page_count(self) -> Optional[int]:
+        return self.data.get("page_count")
+
+    def set_page_count(self, n: int) -> None:
+        self.data["page_count"] = n
+        self.dirty = True
+
+    def text(self, i: int) -> Optional[str]:
+        return self.data["pages"].get(str(i), {}).get("text")
+
+    def set_text(self, i: int, text: str) -> None:
+        self._page(i)["text"] = text
+        self.dirty = True
+
+    def words(self, i: int) -> Optional[List[Dict]]:
+        return self.data["pages"].get(str(i), {}).get("words")
+
+    def set_words(self, i: int, words: List[Dict]) -> None:
+        self._page(i)["words"] = [{k: w[k] for k in WORD_KEYS} for w in words]
+        self.dirty = True
+
+    def sections(self, version: str) -> Optional[Dict[str, List[List[float]]]]:
+        """Section index stored by set_sections() under the same scanner version, if any."""
+        cached = self.data.get("sections")
+        return cached["bands"] if cached and cached.get("version") == version else None
+
+    def set_sections(self, version: str, bands: Dict[str, List[List[float]]]) -> None:
+        self.data["sections"] = {"version": version, "bands": bands}
+        self.dirty = True
+
+    def ocr(self, version: str, key: str) -> Optional[List[Dict]]:
+        """OCR word boxes for one region (see ocr.region_key), if OCR'd before by the same engine settings."""
+        cached = self.data.get("ocr")
+        if not cached or cached.get("version") != version:
+            return None
+        return cached["regions"].get(key)
+
+    def set_ocr(self, version: str, key: str, words: List[Dict]) -> None:
+        cached = self.data.get("ocr")
+        if not cached or cached.get("version") != version:
+            cached = self.data["ocr"] = {"version": version, "regions": {}}
+        cached["regions"][key] = [{k: w[k] for k in WORD_KEYS} for w in words]
+        self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self.dirty = False
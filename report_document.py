@@ -0,0 +1,280 @@
+# report_document.py — one open report PDF shared by the weather and hydro extractors
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from page_cache import PageCache, CACHE_DIR, WORD_KEYS
+from run_metrics import count, stage
+from word_layout import group_rows, rows_text, words_in
+
+DATE_RE = re.compile(r"(\d{4}[./-]\d{2}[./-]\d{2})")
+
+# Section headings we slice the report on (matched on lowercased page text).
+# The bare "rainfall stations" is also a column header inside the hydro table.
+SECTION_MARKERS = {
+    "meteorological": "meteorological stations",
+    "hydro": "hydro catchment",
+    "rainfall": "other rainfall stations",
+}
+
+@lru_cache(maxsize=None)
+def section_scan_version(markers: Tuple[str, ...] = tuple(SECTION_MARKERS.values())) -> str:
+    """Cached section indexes are reused only if scanned by the same pdfium with the same markers."""
+    import pypdfium2 as pdfium
+    return f"pdfium-{pdfium.PDFIUM_INFO}:" + "|".join(markers)
+
+# Below this many words a page counts as having no text layer (an image-only scan)
+MIN_TEXT_WORDS = 20
+
+def _add_bands(bands: Dict[str, List[List[float]]], page: int, heads: List[Tuple[float, str]], height: float) -> None:
+    """Each heading's band runs to the next heading on the page, or to the foot of the page."""
+    heads = sorted(heads)
+    for k, (top, name) in enumerate(heads):
+        bottom = heads[k + 1][0] if k + 1 < len(heads) else height
+        bands.setdefault(name, []).append([page, round(top, 2), round(bottom, 2)])
+
+def scan_sections(path: str, markers: Dict[str, str] = SECTION_MARKERS) -> Dict[str, List[List[float]]]:
+    """
+    Cheap pre-scan with pdfium's text layer (no pdfminer layout analysis):
+    section -> [page, top, bottom] bands, in pdfplumber's top-down points. A
+    band runs from its heading to the next section heading on the page, or to
+    the foot of the page.
+    """
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(path)
+    try:
+        bands: Dict[str, List[List[float]]] = {}
+        for i in range(len(pdf)):
+            page = pdf[i]
+            height = page.get_height()
+            textpage = page.get_textpage()
+            heads = []
+            for name, marker in markers.items():
+                hit = textpage.search(marker, match_case=False).get_next()
+                if hit:
+                    start, n = hit
+                    top = height - max(textpage.get_charbox(j)[3] for j in range(start, start + n))
+                    heads.append((top, name))
+            _add_bands(bands, i, heads, height)
+            textpage.close()
+            page.close()
+        return bands
+    finally:
+        pdf.close()
+
+def word_sections(words: List[Dict], markers: Dict[str, str] = SECTION_MARKERS) -> List[Tuple[float, str]]:
+    """(top, section) for the first row of word boxes holding each section heading; used on OCR output."""
+    heads = {}
+    for row in group_rows(words):
+        line = " ".join(w["text"] for w in row).lower()
+        for name, marker in markers.items():
+            if name not in heads and marker in line:
+                heads[name] = min(w["top"] for w in row)
+    return [(top, name) for name, top in heads.items()]
+
+class ReportDocument:
+    """
+    Opens the PDF once and lazily caches what the extractors ask for:
+    per-page text, the header date and the offsets of the section headings.
+    Which pages and bands hold each section comes from a pdfium pre-scan, so
+    pdfplumber only lays out pages that hold a section we parse. Text, word
+    boxes and the section index also go through the on-disk PageCache, so a
+    report that was extracted before is never opened again. Use as a context
+    manager so the pdfplumber handle is closed and the cache is written back.
+    `markers` names the section headings to slice on (another report type's,
+    see report_types.py).
+    """
+
+    def __init__(self, path: str, cache_dir: Optional[str] = CACHE_DIR,
+                 markers: Dict[str, str] = SECTION_MARKERS):
+        self.path = path
+        self.markers = markers
+        self.cache = PageCache(path, cache_dir) if cache_dir else None
+        self._pdf = None
+        self._text: Dict[int, str] = {}
+        self._words: Dict[int, List[Dict]] = {}
+        self._sections: Dict[int, Dict[str, int]] = {}
+        self._index: Optional[Dict[str, List[List[float]]]] = None
+        self._ocr_done = set()
+        self._header_date: Optional[str] = None
+        self._header_searched = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.save()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            with stage("open"):
+                import pdfplumber
+                self._pdf = pdfplumber.open(self.path)
+        return self._pdf
+
+    @property
+    def page_count(self) -> int:
+        if self.cache is not None:
+            n = self.cache.page_count()
+            if n is None:
+                n = len(self.pdf.pages)
+                self.cache.set_page_count(n)
+            return n
+        return len(self.pdf.pages)
+
+    def page(self, i: int):
+        """pdfplumber page, 0-based."""
+        return self.pdf.pages[i]
+
+    def _layout(self, i: int) -> None:
+        """
+        Take text and word boxes from one pdfplumber layout pass over page i,
+        then release the page's layout objects: the extractors only ever need
+        these two, so nothing is held per page while the document stays open.
+        """
+        page = self.page(i)
+        count("pages_laid_out")
+        try:
+            if i not in self._text:
+                self._text[i] = page.extract_text() or ""
+                if self.cache is not None:
+                    self.cache.set_text(i, self._text[i])
+            if i not in self._words:
+                self._words[i] = [{k: w[k] for k in WORD_KEYS} for w in page.extract_words()]
+                if self.cache is not None:
+                    self.cache.set_words(i, self._words[i])
+        finally:
+            page.close()
+
+    def page_text(self, i: int) -> str:
+        if i not in self._text:
+            text = self.cache.text(i) if self.cache is not None else None
+            if text is None:
+                with stage("extract"):
+                    self._layout(i)
+            else:
+                self._text[i] = text
+        return self._text[i]
+
+    def page_words(self, i: int) -> List[Dict]:
+        """Word boxes (text, x0, x1, top, bottom) for page i."""
+        if i not in self._words:
+            words = self.cache.words(i) if self.cache is not None else None
+            if words is None:
+                with stage("extract"):
+                    self._layout(i)
+            else:
+                self._words[i] = words
+        return self._words[i]
+
+    def has_text(self, i: int) -> bool:
+        """Whether page i has a usable text layer rather than just a scanned image."""
+        return len(self.page_text(i).split()) >= MIN_TEXT_WORDS
+
+    def apply_ocr(self, section: Optional[str] = None) -> bool:
+        """
+        Swap OCR output in where the text layer fails: every page with no text
+        layer in full, and, given `section`, that section's bands on pages that
+        do have text (the caller found nothing plausible in them). Page text,
+        words, section index and header date are then derived from the OCR
+        words, so the parsers run unchanged. False if there was nothing new to
+        OCR or tesseract is unavailable.
+        """
+        from ocr import ocr_regions
+        regions = [(i, None) for i in range(self.page_count) if not self.has_text(i)]
+        if section:
+            regions += [(int(p), (top, bottom)) for p, top, bottom in self.section_index().get(section, [])
+                        if self.has_text(int(p))]
+        regions = [r for r in regions if r not in self._ocr_done]
+        if not regions:
+            return False
+        self._ocr_done.update(regions)
+        count("ocr_regions", len(regions))
+        with stage("ocr"):
+            found = ocr_regions(self.path, regions, self.cache)
+        if not found:
+            return False
+
+        index = {name: list(bands) for name, bands in self.section_index().items()}
+        for (i, band), words in sorted(found.items(), key=lambda kv: (kv[0][0], kv[0][1] or (0.0, 0.0))):
+            if band is None:
+                merged = list(words)
+                _add_bands(index, i, word_sections(words, self.markers), self.page(i).height)
+            else:
+                top, bottom = band
+                merged = [w for w in self.page_words(i) if not top <= (w["top"] + w["bottom"]) / 2 <= bottom] + words
+            self._words[i] = merged
+            self._text[i] = rows_text(merged)
+        self._index = index
+        self._sections.clear()
+        self._header_searched = False
+        self._header_date = None
+        return True
+
+    def sections(self, i: int) -> Dict[str, int]:
+        """Offsets of the section headings found on page i (absent ones omitted)."""
+        if i not in self._sections:
+            low = self.page_text(i).lower()
+            found = {}
+            for name, marker in self.markers.items():
+                p = low.find(marker)
+                if p != -1:
+                    found[name] = p
+            self._sections[i] = found
+        return self._sections[i]
+
+    def section_index(self) -> Dict[str, List[List[float]]]:
+        """section -> [page, top, bottom] bands, from the pdfium pre-scan (see scan_sections)."""
+        if self._index is None:
+            version = section_scan_version(tuple(self.markers.values()))
+            index = self.cache.sections(version) if self.cache is not None else None
+            if index is None:
+                with stage("sections"):
+                    index = scan_sections(self.path, self.markers)
+                if self.cache is not None:
+                    self.cache.set_sections(version, index)
+            self._index = index
+        return self._index
+
+    def pages_with(self, section: str) -> List[int]:
+        """1-based page numbers containing the given section heading."""
+        return sorted({int(band[0]) + 1 for band in self.section_index().get(section, [])})
+
+    def section_words(self, section: str) -> List[Tuple[int, List[Dict]]]:
+        """
+        (0-based page, words) for each band of the section. pdfplumber lays out
+        the whole page either way, so the band is cut from the page's (cached)
+        word boxes rather than from a cropped page.
+        """
+        return [(int(p), words_in(self.page_words(int(p)), top, bottom))
+                for p, top, bottom in self.section_index().get(section, [])]
+
+    def header_date(self) -> Optional[str]:
+        """First YYYY-MM-DD style date in the report, normalised to dashes."""
+        if not self._header_searched:
+            self._header_searched = True
+            for i in range(self.page_count):
+                m = DATE_RE.search(self.page_text(i))
+                if m:
+                    self._header_date = m.group(1).replace("/", "-").replace(".", "-")
+                    break
+        return self._header_date
+
+    def actual_date(self, fallback: str) -> str:
+        """Header date minus 1 day; fallback to folder date (YYYY-MM-DD)."""
+        try:
+            hdr = self.header_date()
+            if hdr:
+                pub = datetime.strptime(hdr, "%Y-%m-%d")
+                return (pub - timedelta(days=1)).strftime("%Y-%m-%d")
+        except Exception:
+            pass
+        return fallback
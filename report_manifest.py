@@ -0,0 +1,95 @@
+# report_manifest.py — remembers which report PDFs are already reflected in a summary CSV
+import os, json, hashlib
+from typing import Dict, List, Optional
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def summary_dates(csv_path: str) -> set:
+    """Dates already present in a summary CSV (empty set if there is none)."""
+    if not os.path.exists(csv_path):
+        return set()
+    import pandas as pd
+    try:
+        old_df = pd.read_csv(csv_path, usecols=["Date"])
+        return set(pd.to_datetime(old_df["Date"]).dt.strftime("%Y-%m-%d"))
+    except Exception:
+        return set()
+
+def _rel(path: str) -> str:
+    return os.path.normpath(path).replace(os.sep, "/")
+
+class ReportManifest:
+    """
+    JSON manifest keyed by PDF path. Each entry records size, mtime, sha256,
+    the parser version that produced the rows and the dates those rows carry.
+
+    size+mtime is the fast path; when mtime moved (e.g. fresh git checkout in CI)
+    the content hash decides, so a re-checkout never forces a re-parse.
+    """
+
+    def __init__(self, path: str, parser_version: str):
+        self.path = path
+        self.parser_version = parser_version
+        self.entries: Dict[str, dict] = {}
+        self.dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self.entries = data.get("reports", {})
+            except Exception:
+                print(f"[manifest] Could not read {path}; starting empty.")
+                self.entries = {}
+
+    def is_current(self, pdf_path: str, known_dates: Optional[set] = None) -> bool:
+        """True if the PDF is unchanged, parsed by this parser version and its dates are in the CSV."""
+        entry = self.entries.get(_rel(pdf_path))
+        if not entry or entry.get("parser_version") != self.parser_version:
+            return False
+        if known_dates is not None and not set(entry.get("dates", [])) <= known_dates:
+            return False
+        st = os.stat(pdf_path)
+        if entry.get("size") != st.st_size:
+            return False
+        if entry.get("mtime") == st.st_mtime:
+            return True
+        if entry.get("sha256") != file_sha256(pdf_path):
+            return False
+        # same content, new mtime: refresh so the next run takes the fast path
+        entry["mtime"] = st.st_mtime
+        self.dirty = True
+        return True
+
+    def record(self, pdf_path: str, dates: List[str], sha256: Optional[str] = None) -> None:
+        st = os.stat(pdf_path)
+        self.entries[_rel(pdf_path)] = {
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "sha256": sha256 or file_sha256(pdf_path),
+            "parser_version": self.parser_version,
+            "dates": sorted(set(dates)),
+        }
+        self.dirty = True
+
+    def prune(self) -> None:
+        """Forget PDFs that no longer exist on disk."""
+        gone = [k for k in self.entries if not os.path.exists(k)]
+        for k in gone:
+            del self.entries[k]
+        if gone:
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"reports": self.entries}, f, indent=1, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp, self.path)
+        self.dirty = False
@@ -0,0 +1,44 @@
+# report_pool.py — run a per-report function serially or across a process pool
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Sequence
+
+def report_pdf(reports_dir: str, date_folder: str, prefix: str = "weather") -> str:
+    return os.path.join(reports_dir, date_folder, f"{prefix}-{date_folder}.pdf")
+
+def report_folders(reports_dir: str, prefix: str = "weather") -> List[str]:
+    """Sorted reports/<date> folders that contain their <prefix>-<date>.pdf."""
+    out = []
+    for date_folder in sorted(os.listdir(reports_dir)):
+        if os.path.isdir(os.path.join(reports_dir, date_folder)) and \
+                os.path.exists(report_pdf(reports_dir, date_folder, prefix)):
+            out.append(date_folder)
+    return out
+
+def resolve_workers(workers: int) -> int:
+    """--workers 0 means one per CPU."""
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def map_reports(fn: Callable, items: Iterable, workers: int = 1) -> Iterator:
+    """
+    Yield fn(item) for every item, always in input order, so the parallel
+    path produces exactly what the serial one does. fn must be a module-level
+    function (picklable) and must not write shared files itself.
+    """
+    items = list(items)
+    workers = min(resolve_workers(workers), len(items))
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        yield from ex.map(fn, items)
+
+def chunked(items: Sequence, size: int) -> List[Sequence]:
+    """
+    items in consecutive slices of `size` (0 = a single slice). Always at
+    least one slice, possibly empty, so callers can treat the last one as
+    the place to finish up.
+    """
+    if size <= 0 or len(items) <= size:
+        return [items]
+    return [items[i:i + size] for i in range(0, len(items), size)]
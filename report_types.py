@@ -0,0 +1,233 @@
+# report_types.py — the meteo.gov.lk bulletins the bot downloads and extracts
+#
+# A ReportType is one PDF product on the site: the menu and link text the
+# downloader follows to find it, the file name it is saved under in
+# reports/<date>/, the section headings its document is sliced on, and the
+# summaries (Products) extracted from it. `meteo.py download` and `extract`
+# run every enabled type through one HTTP session and one process pool, with
+# the same page cache and per-summary manifests.
+#
+# To add a bulletin: write its parser module (as update_rainfall_stations.py),
+# wrap it in a Product below and register a ReportType with its locator and
+# markers. The workflow commits whatever `python meteo.py outputs` lists.
+import importlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence
+
+from report_document import SECTION_MARKERS
+from report_pool import report_folders, report_pdf
+from run_metrics import stage
+
+class Product(ABC):
+    """
+    One summary extracted from a report type, backed by its update_*.py
+    module. parse() runs in worker processes on the open ReportDocument and
+    returns something picklable; begin(), collect() and save() run in the
+    main process, collect() once per report in folder order. Each product
+    brings its own station list (or registry) through that module. A
+    subclass missing parse, collect or save cannot be instantiated, so an
+    incomplete product fails when the registry is built.
+    """
+    name = ""
+    module = ""
+    keys = ["Date"]
+    history = False      # has a Parquet history store (see history_store.py)
+
+    def __init__(self):
+        self.rows: List[dict] = []
+
+    @property
+    def mod(self):
+        return importlib.import_module(self.module)
+
+    @property
+    def summary_csv(self) -> str:
+        return self.mod.OUTPUT_CSV
+
+    @property
+    def manifest_json(self) -> str:
+        return self.mod.MANIFEST_JSON
+
+    @property
+    def parser_version(self) -> str:
+        return self.mod.PARSER_VERSION
+
+    @property
+    def columns(self) -> List[str]:
+        return self.mod.SUMMARY_COLUMNS
+
+    @property
+    def stations(self) -> Optional[List[str]]:
+        """Fixed station columns, for backfill's check for days with no values (None if the table is long)."""
+        return None
+
+    def outputs(self) -> List[str]:
+        """Files (and delta folder) the workflow commits for this product, whether or not they exist yet."""
+        from summary_table import delta_folder
+        return [self.summary_csv, self.manifest_json, delta_folder(self.summary_csv)]
+
+    def begin(self, history: Optional[str] = None) -> None:
+        self.rows = []
+
+    @abstractmethod
+    def parse(self, doc, date_folder: str):
+        """This product's picklable result for one open report."""
+
+    @abstractmethod
+    def collect(self, date_folder: str, result) -> List[str]:
+        """Keep one report's parse() result for save(); returns the dates it carries."""
+
+    @abstractmethod
+    def save(self, last: bool = True) -> None:
+        """Write the collected rows; `last` is False for all but the final chunk of a run."""
+
+    def finish(self) -> None:
+        """Called once after the last save() of a run."""
+
+class WeatherProduct(Product):
+    name, module = "weather", "update_weather_summary"
+    keys = ["Date", "Type"]
+    history = True
+
+    @property
+    def summary_csv(self) -> str:
+        return self.mod.summary_file
+
+    @property
+    def manifest_json(self) -> str:
+        return self.mod.manifest_file
+
+    @property
+    def stations(self) -> List[str]:
+        return self.mod.known_stations
+
+    def outputs(self):
+        from validation import quality_files
+        return super().outputs() + quality_files(self.name)
+
+    def begin(self, history=None):
+        from validation import QualityLog
+        super().begin(history)
+        self.store = self.mod.history_store(history) if history else None
+        self.quality = QualityLog(self.name, self.stations)
+
+    def parse(self, doc, date_folder):
+        unmatched = []
+        return self.mod.parse_report(doc, date_folder, unmatched), unmatched
+
+    def collect(self, date_folder, result):
+        rows, unmatched = result
+        self.mod.write_unmatched(date_folder, unmatched)
+        self.rows.extend(rows)
+        return [r["Date"] for r in rows]
+
+    def save(self, last=True):
+        # Weather date gaps are filled only once the last chunk is in
+        self.mod.save_summary(self.rows, self.store, fill_gaps=last, quality=self.quality)
+        self.rows = []
+
+    def finish(self):
+        with stage("validate"):
+            self.quality.flush()
+
+class HydroProduct(Product):
+    name, module = "hydro", "update_hydro_summary"
+    history = True
+
+    @property
+    def stations(self) -> List[str]:
+        return self.mod.STATIONS
+
+    def outputs(self):
+        from validation import quality_files
+        return super().outputs() + quality_files(self.name)
+
+    def begin(self, history=None):
+        from validation import QualityLog
+        super().begin(history)
+        self.store = self.mod.history_store(history) if history else None
+        self.quality = QualityLog(self.name, self.stations)
+
+    def parse(self, doc, date_folder):
+        return self.mod.hydro_row(doc, date_folder)
+
+    def collect(self, date_folder, row):
+        if not row:
+            return []
+        self.rows.append(row)
+        return [row["Date"]]
+
+    def save(self, last=True):
+        self.mod.save_summary(self.rows, self.store, quality=self.quality)
+        self.rows = []
+
+    def finish(self):
+        with stage("validate"):
+            self.quality.flush()
+
+class RainfallProduct(Product):
+    name, module = "rainfall", "update_rainfall_stations"
+    keys = ["Date", "Station"]
+
+    def outputs(self):
+        return super().outputs() + [self.mod.REGISTRY_CSV]
+
+    def begin(self, history=None):
+        from station_registry import StationRegistry
+        super().begin(history)
+        self.registry = StationRegistry(self.mod.REGISTRY_CSV)
+
+    def parse(self, doc, date_folder):
+        return self.mod.rainfall_pairs(doc, date_folder)
+
+    def collect(self, date_folder, result):
+        # Registry updates stay in the main process, in folder order
+        date, pairs = result
+        self.rows.extend(self.mod.long_rows(date, pairs, self.registry))
+        return [date] if pairs else []
+
+    def save(self, last=True):
+        self.mod.save_summary(self.rows, self.registry)
+        self.rows = []
+
+class ReportType:
+    """
+    One bulletin: `link_text` is the report's link (and submenu entry) under
+    `menu_text` on the site, `prefix` names its file reports/<date>/<prefix>-<date>.pdf,
+    `markers` maps section name -> lowercased heading, and `products` are the
+    summaries parsed from it, in the order they run on each PDF.
+    """
+
+    def __init__(self, name: str, link_text: str, menu_text: str, prefix: str,
+                 markers: Dict[str, str], products: Sequence[Product], enabled: bool = True):
+        self.name = name
+        self.link_text = link_text
+        self.menu_text = menu_text
+        self.prefix = prefix
+        self.markers = markers
+        self.products = list(products)
+        self.enabled = enabled
+
+    def pdf(self, reports_dir: str, date_folder: str) -> str:
+        return report_pdf(reports_dir, date_folder, self.prefix)
+
+    def folders(self, reports_dir: str) -> List[str]:
+        return report_folders(reports_dir, self.prefix)
+
+    def product(self, name: str) -> Product:
+        return next(p for p in self.products if p.name == name)
+
+REPORT_TYPES: Dict[str, ReportType] = {
+    "weather": ReportType("weather", "24 Hour Weather Report", "Observation", "weather", SECTION_MARKERS,
+                          [WeatherProduct(), HydroProduct(), RainfallProduct()]),
+}
+
+def enabled_types(names: Optional[str] = None) -> List[ReportType]:
+    """The report types named in a comma-separated list, or every enabled one."""
+    if not names:
+        return [t for t in REPORT_TYPES.values() if t.enabled]
+    wanted = [n.strip() for n in names.split(",") if n.strip()]
+    unknown = [n for n in wanted if n not in REPORT_TYPES]
+    if unknown:
+        raise SystemExit(f"unknown report type(s) {', '.join(unknown)}; known: {', '.join(REPORT_TYPES)}")
+    return [REPORT_TYPES[n] for n in wanted]
@@ -0,0 +1,66 @@
+# row_scanner.py — one precompiled walk over a table's text, yielding (name, values) records
+import re
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+
+# One cell can be a number or NA / TRACE / TR (with possible punctuation/space between T and R)
+TOKEN = r"(?:(?i:NA|TRACE|T\W*R)|\d+(?:\.\d+)?)"
+TOKEN_RE = re.compile(TOKEN)
+
+Record = Tuple[str, str, Tuple[str, ...]]   # (kind, name, values)
+
+class RowScanner:
+    """
+    Station rows of a table section in a single finditer over its text, with
+    one regex compiled when the scanner is built. Records come out in text
+    order, of two kinds:
+
+      ("row", raw name, values)   `name` text, whitespace, then `width` values
+                                  (the values may sit on the following lines)
+      ("wrap", station, values)   an exact station name whose values do not
+                                  follow it directly; the values are the first
+                                  `width` tokens after it up to the end of the
+                                  next non-blank line
+
+    Wrap records need `stations`; a station named inside a row's raw name is
+    reported as a wrap record too, so a row whose name does not resolve can
+    still be read from the station it contains. `wanted(station)` can veto
+    wrap records the caller has no use for before their values are read.
+    """
+
+    def __init__(self, name: str, width: int, stations: Sequence[str] = (), suffix: str = ""):
+        self.width = width
+        values = r"\s+".join(f"({TOKEN})" for _ in range(width))
+        pattern = rf"({name})\s+{values}{suffix}"
+        self._station_re: Optional[re.Pattern] = None
+        if stations:
+            names = "|".join(re.escape(s) for s in sorted(stations, key=len, reverse=True))
+            self._station_re = re.compile(names)
+            pattern += rf"|({names})"
+        self.regex = re.compile(pattern)
+
+    def values_after(self, text: str, pos: int) -> Optional[Tuple[str, ...]]:
+        """The first `width` tokens from pos to the end of the next non-blank line; None if there are fewer."""
+        end = text.find("\n", pos)
+        while end != -1:
+            nxt = text.find("\n", end + 1)
+            if text[end + 1:nxt if nxt != -1 else len(text)].strip():
+                end = nxt
+                break
+            end = nxt
+        found = TOKEN_RE.findall(text, pos, len(text) if end == -1 else end)
+        return tuple(found[:self.width]) if len(found) >= self.width else None
+
+    def scan(self, text: str, wanted: Callable[[str], bool] = lambda station: True) -> Iterator[Record]:
+        w = self.width
+        for m in self.regex.finditer(text):
+            if m.group(1) is None:
+                values = self.values_after(text, m.end()) if wanted(m.group(w + 2)) else None
+                if values:
+                    yield "wrap", m.group(w + 2), values
+                continue
+            yield "row", m.group(1), m.groups()[1:w + 1]
+            hit = self._station_re.search(text, m.start(1), m.end(1)) if self._station_re else None
+            if hit and wanted(hit.group()):
+                values = self.values_after(text, hit.end())
+                if values:
+                    yield "wrap", hit.group(), values
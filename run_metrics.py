@@ -0,0 +1,156 @@
+# run_metrics.py — stage timers, counters and JSON-lines run summaries for the extractors
+#
+# Parsing code calls stage("match") / count("unmatched_names") unconditionally;
+# both are no-ops unless a RunMetrics is active. Each report is parsed inside
+# collecting(), in whichever process runs it, and its metrics travel back with
+# its rows; MetricsLog writes one JSON line per report and one per run.
+#
+#   METEO_PROFILE_DIR=prof       also profile every report into prof/<folder>.prof
+#   METEO_PROFILER=pyinstrument  ... as prof/<folder>.html instead (needs pyinstrument)
+import os
+import json
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from time import perf_counter
+from typing import Dict, List, Optional
+
+class RunMetrics:
+    """Exclusive wall time per stage plus named counters; nested stages pause their parent."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._stack: List[list] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        now = perf_counter()
+        if self._stack:
+            parent = self._stack[-1]
+            self.seconds[parent[0]] = self.seconds.get(parent[0], 0.0) + now - parent[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = perf_counter()
+            name, since = self._stack.pop()
+            self.seconds[name] = self.seconds.get(name, 0.0) + now - since
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def merge(self, other: dict) -> None:
+        """Add another RunMetrics' as_dict() into this one."""
+        for k, v in other.get("seconds", {}).items():
+            self.seconds[k] = self.seconds.get(k, 0.0) + v
+        for k, v in other.get("counts", {}).items():
+            self.count(k, v)
+
+    def as_dict(self) -> dict:
+        return {"seconds": {k: round(v, 4) for k, v in sorted(self.seconds.items())},
+                "counts": dict(sorted(self.counts.items()))}
+
+_active: Optional[RunMetrics] = None
+
+def stage(name: str):
+    """Time a block under `name` in the active metrics (no-op when none is active)."""
+    return _active.stage(name) if _active is not None else nullcontext()
+
+def count(name: str, n: int = 1) -> None:
+    if _active is not None:
+        _active.count(name, n)
+
+@contextmanager
+def activated(metrics: RunMetrics):
+    global _active
+    previous, _active = _active, metrics
+    try:
+        yield metrics
+    finally:
+        _active = previous
+
+@contextmanager
+def counting():
+    """
+    Yield a dict that holds, once the block ends, the counts made inside it
+    (they still go to the active metrics as usual). Used to keep a memoised
+    result's counters so a later hit can report them again.
+    """
+    metrics = _active if _active is not None else RunMetrics()
+    before = dict(metrics.counts)
+    delta: Dict[str, int] = {}
+    with activated(metrics):
+        yield delta
+    delta.update({k: n - before.get(k, 0) for k, n in metrics.counts.items() if n != before.get(k, 0)})
+
+@contextmanager
+def profiled(name: str):
+    """Profile the block into $METEO_PROFILE_DIR/<name>.prof (or .html with pyinstrument); no-op if unset."""
+    out_dir = os.environ.get("METEO_PROFILE_DIR")
+    if not out_dir:
+        yield
+        return
+    os.makedirs(out_dir, exist_ok=True)
+    if os.environ.get("METEO_PROFILER", "cprofile") == "pyinstrument":
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(os.path.join(out_dir, f"{name}.html"), "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(out_dir, f"{name}.prof"))
+
+@contextmanager
+def collecting(name: str):
+    """Fresh metrics for one report (profiled if asked); yields the RunMetrics to return with its rows."""
+    with activated(RunMetrics()) as metrics, profiled(name):
+        yield metrics
+
+class MetricsLog:
+    """
+    Appends JSON lines to `path`: {"event": "report", ...} per parsed report
+    and one {"event": "run", ...} with the totals when the run ends. With
+    path=None nothing is written, but the totals are still kept.
+    """
+
+    def __init__(self, path: Optional[str], command: str):
+        self.path = path
+        self.command = command
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.metrics = RunMetrics()
+        self.reports = 0
+
+    def _write(self, record: dict) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def report(self, folder: str, metrics: dict, **fields) -> None:
+        """Record one report's metrics (from collecting()) and add them to the run totals."""
+        self.reports += 1
+        self.metrics.merge(metrics)
+        self._write({"event": "report", "run": self.run_id, "folder": folder, **fields, **metrics})
+
+    def close(self, **fields) -> None:
+        self._write({"event": "run", "run": self.run_id, "command": self.command,
+                     "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                     "wall_s": round(time.time() - self.started, 3), "reports": self.reports,
+                     **fields, **self.metrics.as_dict()})
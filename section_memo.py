@@ -0,0 +1,136 @@
+# section_memo.py — parsed section results keyed by a fingerprint of the section, kept across runs
+#
+# Reports often repeat a table verbatim, and every re-run or backfill parses the
+# same sections again. The parsers look each section up here first, by a hash
+# of its text (or word boxes) salted with the parser's version and station
+# lists, so changing either never returns a stale result. Entries live in one
+# SQLite file next to the page cache; the least recently used are evicted
+# beyond MAX_ENTRIES.
+#
+#   METEO_MEMO=""      disable the memo
+#   METEO_MEMO=path    use another file (default .cache/sections.sqlite)
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from multiprocessing import util
+from typing import Any, Dict, Optional
+
+from run_metrics import count, counting
+
+MEMO_PATH = os.environ.get("METEO_MEMO", os.path.join(".cache", "sections.sqlite"))
+MAX_ENTRIES = 20000
+FLUSH_EVERY = 100       # new entries buffered per process before they are written
+TOUCH_AFTER = 86400     # seconds; a hit refreshes an entry's LRU time at most this often
+MEMO_FORMAT = 2         # 2: entries are [value, counters]
+
+def fingerprint(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, separators=(",", ":"), ensure_ascii=False).encode()).hexdigest()
+
+class SectionMemo:
+    """
+    Bounded LRU map fingerprint -> JSON value in SQLite. Safe to share
+    between worker processes: each opens its own connection on first use.
+    New entries are buffered and written FLUSH_EVERY at a time and when the
+    process exits (a lost entry only costs a re-parse), so a run that misses
+    everything pays for a few commits, not one per section.
+    """
+
+    def __init__(self, path: str = MEMO_PATH, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._pending: Dict[str, str] = {}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, value TEXT, used REAL)")
+            self._pid = os.getpid()
+            self._pending = {}
+            # Runs at exit in the main process and in pool workers alike
+            util.Finalize(self, self.flush, exitpriority=10)
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        if key in self._pending:
+            return json.loads(self._pending[key])
+        row = self.conn.execute("SELECT value, used FROM memo WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > TOUCH_AFTER:
+            with self.conn:
+                self.conn.execute("UPDATE memo SET used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        self.conn
+        self._pending[key] = json.dumps(value, ensure_ascii=False)
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered entries, then evict beyond max_entries."""
+        if not self._pending or self._pid != os.getpid():
+            return
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO memo VALUES (?, ?, ?)",
+                                  [(k, v, now) for k, v in self._pending.items()])
+        self._pending = {}
+        self.prune()
+
+    def prune(self) -> int:
+        """Drop the least recently used entries beyond max_entries; returns how many went."""
+        with self.conn:
+            cur = self.conn.execute("""DELETE FROM memo WHERE key IN (
+                                         SELECT key FROM memo ORDER BY used DESC LIMIT -1 OFFSET ?)""",
+                                    (self.max_entries,))
+        return cur.rowcount
+
+_shared: Optional[SectionMemo] = None
+
+def shared() -> Optional[SectionMemo]:
+    """The process-wide memo at MEMO_PATH, or None when disabled."""
+    global _shared
+    if not MEMO_PATH:
+        return None
+    if _shared is None or _shared.path != MEMO_PATH:
+        _shared = SectionMemo(MEMO_PATH)
+    return _shared
+
+def configure(path: str) -> None:
+    """Point the shared memo elsewhere ("" disables it), e.g. for benchmarks that must parse every time."""
+    global MEMO_PATH
+    MEMO_PATH = path
+
+def memoized(kind: str, salt: str, section: Any, parse):
+    """
+    parse() for a section, or its remembered result; counts memo_hits /
+    memo_misses. The counters parse() made are kept with the result and
+    counted again on a hit, so run metrics read the same either way (stage
+    times are not: the work really is skipped).
+    """
+    memo = shared()
+    if memo is None:
+        return parse()
+    key = fingerprint(MEMO_FORMAT, kind, salt, section)
+    hit = memo.get(key)
+    if hit is not None:
+        count("memo_hits")
+        value, counts = hit
+        for name, n in counts.items():
+            count(name, n)
+        return value
+    count("memo_misses")
+    with counting() as counts:
+        value = parse()
+    memo.put(key, [value, counts])
+    return value
@@ -0,0 +1,89 @@
+# station_matcher.py — reusable raw-text -> canonical station lookup for the extractors
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+def trigrams(s: str) -> set:
+    s = f"  {s} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+class StationMatcher:
+    """
+    Maps raw station text from a report to a canonical station name.
+
+    Everything that does not depend on the input is built once: normalised
+    keys, the alias table, a trigram index over the station keys and one regex
+    for finding station names inside a line. A lookup is then
+      1. an exact dict hit on key(raw) (station names and aliases), else
+      2. a fuzzy pass that scores candidates in trigram-overlap order and skips
+         any whose difflib upper bound cannot beat the best so far, so the
+         result is the same as difflib.get_close_matches(n=1, cutoff) would give.
+    Results are memoised per raw string. Pass cutoff=None for exact-only matching.
+    """
+
+    def __init__(self, stations: List[str], aliases: Optional[Dict[str, str]] = None,
+                 key: Callable[[str], str] = lambda s: s.strip().title(),
+                 cutoff: Optional[float] = 0.3, memo_size: int = 4096):
+        self.stations = list(stations)
+        self.key = key
+        self.cutoff = cutoff
+
+        allowed = set(self.stations)
+        self.exact: Dict[str, str] = {key(s): s for s in self.stations}
+        self.exact.update({k: v for k, v in (aliases or {}).items() if v in allowed})
+
+        # fuzzy side compares lowercased keys, like get_close_matches on s.lower()
+        self._fuzzy_keys = [(key(s).lower(), s) for s in self.stations]
+        self._index: Dict[str, List[int]] = {}
+        for i, (k, _) in enumerate(self._fuzzy_keys):
+            for g in trigrams(k):
+                self._index.setdefault(g, []).append(i)
+
+        self._order = {s: i for i, s in enumerate(self.stations)}
+        self._find_re = re.compile("|".join(re.escape(s) for s in sorted(self.stations, key=len, reverse=True)))
+
+        self.match_with_score = lru_cache(maxsize=memo_size)(self._match_with_score)
+
+    def _match_with_score(self, raw: str) -> Tuple[Optional[str], float]:
+        k = self.key(raw)
+        hit = self.exact.get(k)
+        if hit is not None:
+            return hit, 1.0
+        if self.cutoff is None:
+            return None, 0.0
+        return self._fuzzy(k.lower())
+
+    def _fuzzy(self, word: str) -> Tuple[Optional[str], float]:
+        # Most-shared-trigrams first, so the best candidate usually comes early
+        # and the quick_ratio bounds prune the rest.
+        shared: Dict[int, int] = {}
+        for g in trigrams(word):
+            for i in self._index.get(g, ()):
+                shared[i] = shared.get(i, 0) + 1
+        order = sorted(range(len(self._fuzzy_keys)), key=lambda i: -shared.get(i, 0))
+
+        sm = SequenceMatcher()
+        sm.set_seq2(word)
+        best: Tuple[float, str] = (self.cutoff, "")
+        best_station = None
+        for i in order:
+            cand, station = self._fuzzy_keys[i]
+            sm.set_seq1(cand)
+            # ties go to the larger string, as in get_close_matches' nlargest
+            if sm.real_quick_ratio() < best[0] or sm.quick_ratio() < best[0]:
+                continue
+            score = sm.ratio()
+            if (score, cand) >= best and score >= self.cutoff:
+                best, best_station = (score, cand), station
+        return best_station, (best[0] if best_station else 0.0)
+
+    def match(self, raw: str) -> Optional[str]:
+        return self.match_with_score(raw)[0]
+
+    def find_in(self, line: str) -> Optional[str]:
+        """First station (in station-list order) whose exact name occurs in line."""
+        found = set(self._find_re.findall(line))
+        if not found:
+            return None
+        return min(found, key=self._order.__getitem__)
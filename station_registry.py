@@ -0,0 +1,85 @@
+# station_registry.py — rainfall gauges seen so far, growing as new names appear in reports
+#
+# Kept as a small CSV (Station, Aliases, First Seen, Last Seen) next to the
+# summaries. A name resolves by its key (letters and digits, lowercased), so
+# "Palanda(ARG)" and "Palanda (ARG)" are one station; spellings that differ in
+# more than that are merged by listing them in Aliases, separated by "|".
+import os
+import re
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+COLUMNS = ["Station", "Aliases", "First Seen", "Last Seen"]
+
+def station_key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+def display_name(raw: str) -> str:
+    """Report text as a station name: single spaces, one space before "(", none inside the brackets."""
+    name = re.sub(r"\s+", " ", raw).strip()
+    name = re.sub(r"\s*\(\s*", " (", name)
+    name = re.sub(r"\s*\)", ")", name)
+    return name.strip()
+
+class StationRegistry:
+    """
+    Canonical station names by key. resolve() adds a name it has not seen
+    before as a new station, so the registry only ever grows; save() writes
+    it back when something changed. Used in the main process only.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows: Dict[str, Dict[str, str]] = {}   # station -> row
+        self._index: Dict[str, str] = {}            # key of name or alias -> station
+        self.added: List[str] = []
+        self.dirty = False
+        if os.path.exists(path):
+            df = pd.read_csv(path, dtype=str, keep_default_na=False).reindex(columns=COLUMNS, fill_value="")
+            for row in df.to_dict("records"):
+                self._add(row)
+
+    def _add(self, row: Dict[str, str]) -> None:
+        station = row["Station"]
+        self.rows[station] = row
+        self._index.setdefault(station_key(station), station)
+        for alias in filter(None, row["Aliases"].split("|")):
+            self._index.setdefault(station_key(alias), station)
+
+    @property
+    def stations(self) -> List[str]:
+        return sorted(self.rows)
+
+    def lookup(self, raw: str) -> Optional[str]:
+        return self._index.get(station_key(raw))
+
+    def resolve(self, raw: str, date: str) -> str:
+        """Canonical name for raw report text, registering it on first sight; `date` updates First/Last Seen."""
+        station = self.lookup(raw)
+        if station is None:
+            station = display_name(raw)
+            self._add({"Station": station, "Aliases": "", "First Seen": date, "Last Seen": date})
+            self.added.append(station)
+            self.dirty = True
+            return station
+        row = self.rows[station]
+        if not row["First Seen"] or date < row["First Seen"]:
+            row["First Seen"] = date
+            self.dirty = True
+        if date > row["Last Seen"]:
+            row["Last Seen"] = date
+            self.dirty = True
+        return station
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        df = pd.DataFrame([self.rows[s] for s in self.stations], columns=COLUMNS)
+        tmp = self.path + ".tmp"
+        df.to_csv(tmp, index=False)
+        os.replace(tmp, self.path)
+        if self.added:
+            print(f"[registry] {len(self.added)} new station(s) in {self.path}")
+        self.added = []
+        self.dirty = False
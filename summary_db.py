@@ -0,0 +1,259 @@
+# summary_db.py — indexed SQLite copy of the summary CSVs, with a small read API
+#
+#   python summary_db.py sync                 load new/changed days from the CSVs
+#   python summary_db.py serve --port 8001    JSON over HTTP (see Handler)
+#
+# Every cell is one (product, type, station, date) row keyed for per-station
+# time series, with a second index by date for range queries. Rolling 7/30-day
+# totals and monthly max/min/total are stored next to the readings and
+# refreshed only around the days a sync changed, so lookups never re-read a CSV.
+import os
+import json
+import sqlite3
+import hashlib
+import argparse
+from datetime import date as Date, timedelta
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from history_store import encode_cell
+from summary_table import read_summary
+
+DB_PATH = "summary.sqlite"
+
+# product -> (CSV, row-type column or None, long-form value column or None)
+PRODUCTS = {
+    "weather":  ("weather_summary.csv", "Type", None),
+    "hydro":    ("hydrocatchment_summary.csv", None, None),
+    "rainfall": ("rainfall_summary.csv", None, "Value"),
+}
+
+# Per-row stats the summary scripts add beside the stations; derived, so not stored as readings
+STAT_COLUMNS = {"Average", "Total", "Max", "Min"}
+
+# Bumped when what a day stores changes; an older database re-syncs every day
+SCHEMA_VERSION = 2   # 2: stat columns are no longer stored as stations
+
+# Types whose values add up over days (temperatures get monthly max/min only)
+ROLLING_TYPES = {"weather": {"Rainfall"}, "hydro": {""}, "rainfall": {""}}
+WINDOWS = (7, 30)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    product TEXT, type TEXT, station TEXT, date TEXT, value REAL, flag TEXT,
+    PRIMARY KEY (product, type, station, date)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS readings_by_date ON readings (product, date);
+CREATE TABLE IF NOT EXISTS days (
+    product TEXT, date TEXT, digest TEXT,
+    PRIMARY KEY (product, date)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rolling (
+    product TEXT, type TEXT, station TEXT, date TEXT, total_7 REAL, total_30 REAL,
+    PRIMARY KEY (product, type, station, date)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS monthly (
+    product TEXT, type TEXT, station TEXT, month TEXT, max REAL, min REAL, total REAL, days INTEGER,
+    PRIMARY KEY (product, type, station, month)) WITHOUT ROWID;
+"""
+
+def day_cells(product: str, records: List[dict]) -> List[tuple]:
+    """(type, station, value, flag) for one day's CSV rows, in the product's shape."""
+    _, type_key, value_key = PRODUCTS[product]
+    cells = []
+    for r in records:
+        typ = r[type_key] if type_key else ""
+        if value_key:
+            cells.append((typ, r["Station"], *encode_cell(r[value_key])))
+            continue
+        for col, text in r.items():
+            if col not in ("Date", type_key) and col not in STAT_COLUMNS:
+                cells.append((typ, col, *encode_cell(text)))
+    return cells
+
+def affected_spans(days: List[str], span: int) -> List[tuple]:
+    """Sorted days widened to [day, day + span] and merged where they overlap, as (first, last) ISO dates."""
+    spans: List[list] = []
+    for day in days:
+        start = Date.fromisoformat(day)
+        if spans and start <= spans[-1][1] + timedelta(days=1):
+            spans[-1][1] = start + timedelta(days=span)
+        else:
+            spans.append([start, start + timedelta(days=span)])
+    return [(a.isoformat(), b.isoformat()) for a, b in spans]
+
+class SummaryDB:
+    """
+    The SQLite store. sync() brings one product up to date with its CSV;
+    the query methods return plain dicts and use only indexed lookups.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with self.conn:
+                self.conn.execute("DELETE FROM days")
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # --- loading ---------------------------------------------------------
+
+    def sync(self, product: str, csv_path: Optional[str] = None) -> List[str]:
+        """Write the days whose CSV rows changed since the last sync (and drop vanished ones); returns them."""
+        csv_path = csv_path or PRODUCTS[product][0]
+        if not os.path.exists(csv_path):
+            return []
+        df = read_summary(csv_path)
+        stored = dict(self.conn.execute("SELECT date, digest FROM days WHERE product = ?", (product,)).fetchall())
+        changed = []
+        with self.conn:
+            for day, group in df.groupby("Date", sort=True):
+                records = group.to_dict("records")
+                digest = hashlib.sha1(json.dumps(records, sort_keys=True).encode()).hexdigest()
+                if stored.pop(day, None) == digest:
+                    continue
+                self._write_day(product, day, day_cells(product, records), digest)
+                changed.append(day)
+            for day in stored:
+                self._write_day(product, day, [], None)
+                changed.append(day)
+            self._refresh_aggregates(product, changed)
+        return sorted(changed)
+
+    def _write_day(self, product: str, day: str, cells: List[tuple], digest: Optional[str]) -> None:
+        self.conn.execute("DELETE FROM readings WHERE product = ? AND date = ?", (product, day))
+        self.conn.execute("DELETE FROM days WHERE product = ? AND date = ?", (product, day))
+        if digest is None:
+            return
+        self.conn.executemany("INSERT OR REPLACE INTO readings VALUES (?, ?, ?, ?, ?, ?)",
+                              [(product, typ, st, day, v, flag) for typ, st, v, flag in cells])
+        self.conn.execute("INSERT INTO days VALUES (?, ?, ?)", (product, day, digest))
+
+    def _refresh_aggregates(self, product: str, days: Iterable[str]) -> None:
+        """Recompute the rolling rows a changed day falls inside, and its month."""
+        days = sorted(set(days))
+        if not days:
+            return
+        rolling_types = sorted(ROLLING_TYPES[product])
+        marks = ",".join("?" * len(rolling_types))
+        for day, until in affected_spans(days, max(WINDOWS) - 1):
+            self.conn.execute("DELETE FROM rolling WHERE product = ? AND date BETWEEN ? AND ?",
+                              (product, day, until))
+            self.conn.execute(f"""
+                INSERT INTO rolling
+                SELECT r.product, r.type, r.station, r.date,
+                       (SELECT ROUND(SUM(x.value), 2) FROM readings x
+                         WHERE x.product = r.product AND x.type = r.type AND x.station = r.station
+                           AND x.date BETWEEN date(r.date, '-{WINDOWS[0] - 1} days') AND r.date),
+                       (SELECT ROUND(SUM(x.value), 2) FROM readings x
+                         WHERE x.product = r.product AND x.type = r.type AND x.station = r.station
+                           AND x.date BETWEEN date(r.date, '-{WINDOWS[1] - 1} days') AND r.date)
+                  FROM readings r
+                 WHERE r.product = ? AND r.date BETWEEN ? AND ? AND r.type IN ({marks})""",
+                (product, day, until, *rolling_types))
+        for month in sorted({d[:7] for d in days}):
+            first, last = f"{month}-01", f"{month}-31"
+            self.conn.execute("DELETE FROM monthly WHERE product = ? AND month = ?", (product, month))
+            self.conn.execute("""
+                INSERT INTO monthly
+                SELECT product, type, station, ?, MAX(value), MIN(value), ROUND(SUM(value), 2), COUNT(value)
+                  FROM readings WHERE product = ? AND date BETWEEN ? AND ?
+                 GROUP BY type, station""", (month, product, first, last))
+
+    # --- queries ---------------------------------------------------------
+
+    def _rows(self, sql: str, params: tuple) -> List[Dict]:
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def series(self, product: str, station: str, type: str = "", since: str = "",
+               until: str = "9999") -> List[Dict]:
+        """One station's readings in date order, optionally within [since, until]."""
+        return self._rows("""SELECT date, value, flag FROM readings
+                              WHERE product = ? AND type = ? AND station = ? AND date BETWEEN ? AND ?
+                              ORDER BY date""", (product, type, station, since, until))
+
+    def range(self, product: str, since: str, until: str, type: Optional[str] = None) -> List[Dict]:
+        """Every reading between two dates (of one type if given), ordered by date then station."""
+        sql = "SELECT date, type, station, value, flag FROM readings WHERE product = ? AND date BETWEEN ? AND ?"
+        params = (product, since, until)
+        if type is not None:
+            sql, params = sql + " AND type = ?", params + (type,)
+        return self._rows(sql + " ORDER BY date, type, station", params)
+
+    def rolling(self, product: str, station: str, day: str, type: str = "") -> Optional[Dict]:
+        """7- and 30-day totals ending on `day` (None if the station has no reading that day)."""
+        rows = self._rows("""SELECT date, total_7, total_30 FROM rolling
+                              WHERE product = ? AND type = ? AND station = ? AND date = ?""",
+                          (product, type, station, day))
+        return rows[0] if rows else None
+
+    def monthly(self, product: str, station: str, type: str = "", month: Optional[str] = None) -> List[Dict]:
+        """Monthly max/min/total/days for a station, every month or just `month` (YYYY-MM)."""
+        sql = "SELECT month, max, min, total, days FROM monthly WHERE product = ? AND type = ? AND station = ?"
+        params = (product, type, station)
+        if month:
+            sql, params = sql + " AND month = ?", params + (month,)
+        return self._rows(sql + " ORDER BY month", params)
+
+    def stations(self, product: str) -> List[Dict]:
+        return self._rows("SELECT DISTINCT type, station FROM monthly WHERE product = ? ORDER BY type, station",
+                          (product,))
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    GET /<method>?product=...&station=...   for series, range, rolling, monthly and stations,
+    with the method's other arguments as query parameters. Answers JSON.
+    """
+    METHODS = {"series", "range", "rolling", "monthly", "stations"}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        name = url.path.strip("/")
+        args = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        if name not in self.METHODS:
+            return self._send(404, {"error": f"unknown endpoint /{name}"})
+        if args.get("product") not in PRODUCTS:
+            return self._send(400, {"error": f"product must be one of {sorted(PRODUCTS)}"})
+        try:
+            result = getattr(self.server.db, name)(**args)
+        except TypeError as e:
+            return self._send(400, {"error": str(e)})
+        self._send(200, result)
+
+    def _send(self, code: int, payload) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def sync_all(db: SummaryDB) -> None:
+    for product in PRODUCTS:
+        changed = db.sync(product)
+        print(f"[db] {product}: {len(changed)} day(s) updated in {db.path}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Indexed SQLite read API over the summary CSVs")
+    ap.add_argument("action", choices=["sync", "serve"])
+    ap.add_argument("--db", default=DB_PATH, help=f"SQLite file (default: {DB_PATH})")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    args = ap.parse_args(argv)
+    db = SummaryDB(args.db)
+    sync_all(db)
+    if args.action == "serve":
+        server = HTTPServer((args.host, args.port), Handler)
+        server.db = db
+        print(f"[db] serving http://{args.host}:{args.port}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# summary_table.py — column-wise stats and keyed upsert shared by the summary CSVs
+import io
+import os
+import pandas as pd
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+def read_summary(path: str) -> pd.DataFrame:
+    """Existing summary CSV with every cell kept as written ("NA" stays "NA", "30.0" stays "30.0")."""
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+def station_values(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """
+    Station cells as floats, converted once per column. "", "NA" and anything
+    unparsable become NaN and are left out of the stats; trace is already 0.01.
+    """
+    return df.reindex(columns=columns).apply(pd.to_numeric, errors="coerce")
+
+def add_stats(df: pd.DataFrame, columns: List[str], stats: Dict[str, str]) -> pd.DataFrame:
+    """
+    Append aggregate columns, e.g. {"Average": "mean", "Max": "max", "Min": "min"},
+    computed across `columns` and rounded to 1 decimal. Rows with no numeric
+    value get "" like the old per-row code.
+
+    Sums are accumulated column by column, left to right, and rounded with
+    Python's round(), so results match sum(nums) / round(x, 1) to the last digit.
+    """
+    vals = station_values(df, columns)
+    count = vals.notna().sum(axis=1)
+    total = pd.Series(0.0, index=vals.index)
+    for c in columns:
+        total = total + vals[c].fillna(0.0)
+    agg = {
+        "sum": total,
+        "mean": total / count,
+        "max": vals.max(axis=1, skipna=True),
+        "min": vals.min(axis=1, skipna=True),
+    }
+    for name, how in stats.items():
+        col = agg[how]
+        df[name] = [round(v, 1) if n else "" for v, n in zip(col.tolist(), count.tolist())]
+    return df
+
+def upsert(old: pd.DataFrame, new: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """
+    Replace rows of `old` whose keys appear in `new` (the last duplicate in
+    `new` wins) and add the rest, sorted by keys. The daily case — only keys
+    after everything in `old` — is a plain append with no re-sort.
+    """
+    new = new.drop_duplicates(subset=keys, keep="last")
+    if old is None or old.empty:
+        return new.sort_values(keys, ignore_index=True)
+
+    old_idx = pd.MultiIndex.from_frame(old[keys])
+    new_idx = pd.MultiIndex.from_frame(new[keys])
+    kept = old[~old_idx.isin(new_idx)]
+    kept_idx = old_idx[~old_idx.isin(new_idx)]
+
+    merged = pd.concat([kept, new], ignore_index=True)
+    new_sorted = new_idx.is_monotonic_increasing
+    if kept_idx.is_monotonic_increasing and new_sorted and (kept.empty or new.empty or kept_idx[-1] < new_idx[0]):
+        return merged
+    return merged.sort_values(keys, ignore_index=True)
+
+def merge_into_csv(path: str, new: pd.DataFrame, keys: List[str], columns: List[str]) -> pd.DataFrame:
+    """Upsert `new` into the CSV at path (if any) and return the full table in `columns` order."""
+    old = read_summary(path) if os.path.exists(path) else None
+    df = upsert(old, new, keys)
+    return df.reindex(columns=columns)
+
+# Per-day copies of the rows each run wrote, so a consumer can pick up one day
+# without re-reading the history: <DELTA_DIR>/<csv name>/<YYYY-MM-DD>.csv
+DELTA_DIR = "deltas"
+
+def as_written(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """`df` as the cell text to_csv writes for it, so its rows compare exactly with read_summary's."""
+    text = df.reindex(columns=columns).to_csv(index=False)
+    return pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False)
+
+def write_csv_atomic(df: pd.DataFrame, path: str) -> None:
+    """Write via a temp file and rename, so a crash never leaves a half-written CSV."""
+    tmp = path + ".tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+def delta_folder(path: str, delta_dir: str = DELTA_DIR) -> str:
+    """Where the per-day copies of the CSV at path go."""
+    return os.path.join(delta_dir, os.path.splitext(os.path.basename(path))[0])
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return False
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def _append_rows(path: str, rows: pd.DataFrame) -> None:
+    """Append rows as CSV lines; on failure the file is cut back to its old length."""
+    data = rows.to_csv(index=False, header=False).encode("utf-8")
+    with open(path, "ab") as f:
+        size = f.tell()
+        try:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.truncate(size)
+            raise
+
+def _write_deltas(path: str, df: pd.DataFrame, dates, delta_dir: str) -> None:
+    out_dir = delta_folder(path, delta_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    for d in sorted(dates):
+        write_csv_atomic(df[df["Date"] == d], os.path.join(out_dir, f"{d}.csv"))
+
+def write_summary(path: str, new: pd.DataFrame, keys: List[str], columns: List[str],
+                  replace_days: bool = False, days: Optional[Iterable[str]] = None,
+                  delta_dir: Optional[str] = DELTA_DIR) -> pd.DataFrame:
+    """
+    Upsert `new` into the CSV at path, writing only what changed, and return
+    the full table in `columns` order. Rows identical to the stored ones are
+    not written at all; new rows that sort after everything stored (the daily
+    case) are appended in place; anything else (a changed row, a back-filled
+    day, a column change) rewrites the file atomically. With replace_days,
+    every stored row of a Date in `new` (or in `days`, if given) is replaced,
+    for long tables where a re-parsed day may lose a row. The days that
+    changed are also written to `delta_dir` (unless None).
+    """
+    new = as_written(new, columns).drop_duplicates(subset=keys, keep="last")
+    old = read_summary(path) if os.path.exists(path) else None
+    days = set(new["Date"]) if days is None else set(days)
+    if old is None or old.empty:
+        merged = upsert(None, new, keys).reindex(columns=columns)
+        write_csv_atomic(merged, path)
+        changed_dates = set(new["Date"])
+    else:
+        stored = old.reindex(columns=columns, fill_value="")
+        base = old[~old["Date"].isin(days)] if replace_days else old
+        merged = upsert(base, new, keys).reindex(columns=columns)
+
+        added = new.merge(stored.drop_duplicates(), how="left", on=columns, indicator=True)
+        added = new[(added["_merge"] == "left_only").to_numpy()]
+        dropped = stored[stored["Date"].isin(days)] if replace_days else stored.iloc[:0]
+        dropped = dropped.merge(new, how="left", on=columns, indicator=True)
+        dropped = dropped[dropped["_merge"] == "left_only"]
+
+        changed_dates = set(added["Date"]) | set(dropped["Date"])
+        if not changed_dates and list(old.columns) == columns:
+            return merged
+        added = added.sort_values(keys, ignore_index=True)
+        last = tuple(old[keys].iloc[-1])
+        appendable = (list(old.columns) == columns and dropped.empty and not added.empty
+                      and tuple(added[keys].iloc[0]) > last and _ends_with_newline(path))
+        if appendable:
+            _append_rows(path, added)
+        else:
+            write_csv_atomic(merged, path)
+    if delta_dir:
+        _write_deltas(path, merged, changed_dates, delta_dir)
+    return merged
+
+def compact_summary(path: str, keys: List[str], columns: List[str], delta_dir: Optional[str] = DELTA_DIR,
+                    keep_days: int = 30) -> int:
+    """
+    Rewrite the CSV sorted and de-duplicated in `columns` order (only if that
+    changes it) and delete its delta files dated more than keep_days ago.
+    Returns the number of delta files removed.
+    """
+    if os.path.exists(path):
+        old = read_summary(path)
+        df = upsert(None, old, keys).reindex(columns=columns, fill_value="")
+        if list(old.columns) != columns or not df.equals(old):
+            write_csv_atomic(df, path)
+    removed = 0
+    out_dir = delta_folder(path, delta_dir) if delta_dir else None
+    if out_dir and os.path.isdir(out_dir):
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        for name in sorted(os.listdir(out_dir)):
+            if name.endswith(".csv") and name[:-4] < cutoff:
+                os.remove(os.path.join(out_dir, name))
+                removed += 1
+    return removed
@@ -0,0 +1,112 @@
+# test_backfill.py — backfill --url-template against local_site on an ephemeral port
+#
+#   python -m pytest -q test_backfill.py
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import meteo
+from backfill import BackfillState, FETCHED, MISSING, backfill_downloads, fetch_dates, missing_report_dates
+from local_site import make_handler, make_server
+
+REPORTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports")
+FIRST, GAP, LAST = "2025-06-19", "2025-06-20", "2025-06-21"
+TEMPLATE = "{base}/files/weather-{{date}}.pdf"
+
+class Site:
+    """local_site over a copy of three report folders, counting PDF requests and how many overlap."""
+
+    def __init__(self, root):
+        for d in (FIRST, GAP, LAST):
+            shutil.copytree(os.path.join(REPORTS, d), os.path.join(root, d))
+        self.requests, self.active, self.peak = [], 0, 0
+        self.delay = 0.0
+        lock, site = threading.Lock(), self
+
+        class Handler(make_handler(root, LAST)):
+            def do_GET(self):
+                if not self.path.startswith("/files/"):
+                    return super().do_GET()
+                with lock:
+                    site.requests.append(self.path)
+                    site.active += 1
+                    site.peak = max(site.peak, site.active)
+                try:
+                    time.sleep(site.delay)
+                    return super().do_GET()
+                finally:
+                    with lock:
+                        site.active -= 1
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self.server = make_server(root, LAST, port=0)
+        self.server.RequestHandlerClass = Handler
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.template = TEMPLATE.format(base=f"http://127.0.0.1:{self.server.server_address[1]}")
+
+    def requested(self):
+        dates = sorted(p[len("/files/weather-"):-len(".pdf")] for p in self.requests)
+        self.requests = []
+        return dates
+
+@pytest.fixture
+def site(tmp_path):
+    site = Site(str(tmp_path / "site"))
+    yield site
+    site.server.shutdown()
+    site.server.server_close()
+
+@pytest.fixture
+def reports(tmp_path):
+    """The bot's reports/ with the middle folder missing."""
+    out = tmp_path / "reports"
+    for d in (FIRST, LAST):
+        shutil.copytree(os.path.join(REPORTS, d), out / d)
+    return out
+
+def test_missing_report_dates(reports):
+    assert missing_report_dates(str(reports), {}, until=LAST) == [GAP]
+    assert missing_report_dates(str(reports), {}, until="2025-06-23") == [GAP, "2025-06-22", "2025-06-23"]
+    assert missing_report_dates(str(reports), {}, since=LAST, until="2025-06-22") == ["2025-06-22"]
+
+def test_fetch_dates_respects_concurrency(site, reports):
+    site.delay = 0.2
+    dates = [GAP, "2025-06-22", "2025-06-23", "2025-06-24", "2025-06-25"]
+    state = BackfillState(str(reports / ".backfill_state.json"))
+    fetched = asyncio.run(fetch_dates(dates, site.template, str(reports), state, concurrency=2, rate=0))
+    assert fetched == [GAP]
+    assert site.peak == 2
+    assert site.requested() == dates
+
+def test_state_resumes_and_retry_missing(site, reports):
+    until = "2025-06-23"
+    assert backfill_downloads(site.template, str(reports), {}, until=until, rate=0) == [GAP]
+    assert site.requested() == [GAP, "2025-06-22", "2025-06-23"]
+    with open(reports / ".backfill_state.json", encoding="utf-8") as f:
+        state = json.load(f)
+    assert {d: s["status"] for d, s in state.items()} == {GAP: FETCHED, "2025-06-22": MISSING,
+                                                         "2025-06-23": MISSING}
+
+    # A fetched date is settled even if its folder goes away again; missing ones too, by default
+    shutil.rmtree(reports / GAP)
+    assert backfill_downloads(site.template, str(reports), {}, until=until, rate=0) == []
+    assert site.requested() == []
+
+    assert backfill_downloads(site.template, str(reports), {}, until=until, rate=0, retry_missing=True) == []
+    assert site.requested() == ["2025-06-22", "2025-06-23"]
+
+def test_only_fetched_folders_are_extracted(site, reports, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    meteo.main(["backfill", "--url-template", site.template, "--until", "2025-06-22", "--rate", "0"])
+    assert site.requested() == [GAP, "2025-06-22"]
+
+    for manifest in ("weather_manifest.json", "hydro_manifest.json", "rainfall_manifest.json"):
+        with open(manifest, encoding="utf-8") as f:
+            assert list(json.load(f)["reports"]) == [f"reports/{GAP}/weather-{GAP}.pdf"]
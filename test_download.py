@@ -0,0 +1,120 @@
+# test_download.py — link resolution and fetch_pdf against local_site on an ephemeral port
+#
+#   python -m pytest -q test_download.py
+import os
+import threading
+
+import pytest
+
+from download_weather_pdf import (DownloadError, download_report_http, fetch_pdf, find_links, make_session,
+                                  resolve_report_url)
+from local_site import INDEX_HTML, make_handler, make_server
+
+DATE = "2025-06-20"
+PDF = b"%PDF-1.4\n% stand-in report\n%%EOF\n"
+
+def leftovers(folder):
+    return [n for n in os.listdir(folder) if n.startswith(".download-")]
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+@pytest.fixture
+def site(tmp_path):
+    """(base url, reports dir of the site, download dir) with one report served."""
+    served = tmp_path / "site"
+    (served / DATE).mkdir(parents=True)
+    (served / DATE / f"weather-{DATE}.pdf").write_bytes(PDF)
+    server = make_server(str(served), DATE, port=0)
+    yield serve(server), served, tmp_path / "reports"
+    server.shutdown()
+    server.server_close()
+
+def test_atomic_write_then_304(site):
+    base, _, reports = site
+    url, dst = f"{base}/files/weather-{DATE}.pdf", str(reports / DATE / f"weather-{DATE}.pdf")
+    state, session = {}, make_session(retries=0)
+
+    assert fetch_pdf(session, url, dst, state)
+    with open(dst, "rb") as f:
+        assert f.read() == PDF
+    assert leftovers(os.path.dirname(dst)) == []
+    assert state[url]["etag"] and state[url]["saved_as"] == dst.replace(os.sep, "/")
+
+    # Same ETag: the server answers 304 and nothing is written
+    mtime = os.path.getmtime(dst)
+    assert not fetch_pdf(session, url, dst, state)
+    assert os.path.getmtime(dst) == mtime
+
+def test_same_content_is_not_saved_twice(site):
+    base, _, reports = site
+    url = f"{base}/files/weather-{DATE}.pdf"
+    state, session = {}, make_session(retries=0)
+    assert fetch_pdf(session, url, str(reports / DATE / "first.pdf"), state)
+
+    # Without validators the server sends the body again; its hash matches the saved report
+    state[url].update(etag=None, last_modified=None)
+    other = reports / "2025-06-21" / "weather-2025-06-21.pdf"
+    assert not fetch_pdf(session, url, str(other), state)
+    assert not other.exists()
+    assert leftovers(other.parent) == []
+
+def test_failed_download_keeps_the_old_file(site):
+    base, served, reports = site
+    day = "2025-06-22"
+    (served / day).mkdir()
+    (served / day / f"weather-{day}.pdf").write_bytes(b"<html>maintenance</html>")
+    dst = reports / day / f"weather-{day}.pdf"
+    dst.parent.mkdir(parents=True)
+    dst.write_bytes(PDF)
+
+    with pytest.raises(DownloadError):
+        fetch_pdf(make_session(retries=0), f"{base}/files/weather-{day}.pdf", str(dst), {})
+    assert dst.read_bytes() == PDF
+    assert leftovers(dst.parent) == []
+
+def test_find_links_resolves_against_the_page():
+    links = find_links(INDEX_HTML, "http://127.0.0.1:8000/en/")
+    assert ("http://127.0.0.1:8000/en", "English") in links
+    assert ("http://127.0.0.1:8000/en/observation/24-hour-weather-report", "24 Hour Weather Report") in links
+
+def test_resolve_and_download_from_the_nav_pages(site):
+    base, _, reports = site
+    session = make_session(retries=0)
+    assert resolve_report_url(session, base + "/") == f"{base}/files/weather-{DATE}.pdf"
+
+    path = download_report_http(str(reports), today=DATE, base_url=base + "/", session=session)
+    assert path == str(reports / DATE / f"weather-{DATE}.pdf")
+    with open(path, "rb") as f:
+        assert f.read() == PDF
+    assert (reports / ".download_state.json").exists()
+    # The site still links the same report: 304, nothing new
+    assert download_report_http(str(reports), today=DATE, base_url=base + "/", session=session) is None
+
+def test_report_link_without_pdf_suffix(site):
+    _, served, reports = site
+    handler = make_handler(str(served), DATE)
+
+    class Handler(handler):
+        # The report page links /download/<date>, which the server answers with the PDF
+        def do_GET(self):
+            if self.path == "/en/observation/24-hour-weather-report":
+                page = f'<a href="/download/{DATE}">24 Hour Weather Report</a>'.encode()
+                return self._send(200, page)
+            if self.path.startswith("/download/"):
+                self.path = f"/files/weather-{self.path[len('/download/'):]}.pdf"
+            return super().do_GET()
+
+    server = make_server(str(served), DATE, port=0)
+    server.RequestHandlerClass = Handler
+    base = serve(server)
+    try:
+        session = make_session(retries=0)
+        assert resolve_report_url(session, base + "/") == f"{base}/download/{DATE}"
+        path = download_report_http(str(reports), today=DATE, base_url=base + "/", session=session)
+        with open(path, "rb") as f:
+            assert f.read() == PDF
+    finally:
+        server.shutdown()
+        server.server_close()
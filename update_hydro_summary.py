@@ -1,20 +1,30 @@
 # update_hydro_summary.py (Date, stations..., Total, Max, Min)
-import os, re, warnings
+import os, re, argparse
+import importlib.util
 import pandas as pd
-import pdfplumber, PyPDF2
-from datetime import datetime, timedelta
-from typing import Dict, List
-
-# Prefer Camelot for table parsing; fallback to text
-try:
-    import camelot
-    HAVE_CAMELOT = True
-except Exception:
-    HAVE_CAMELOT = False
-    warnings.warn("camelot not available; using text fallback only")
+from typing import Dict, List, Optional, Tuple
+from report_document import ReportDocument
+from report_manifest import ReportManifest, summary_dates
+from report_pool import chunked, map_reports, report_folders, report_pdf
+from row_scanner import RowScanner, TOKEN_RE
+from run_metrics import MetricsLog, activated, collecting, count, stage
+from section_memo import fingerprint, memoized
+from station_matcher import StationMatcher
+from word_layout import columns, group_rows
+from summary_table import add_stats, write_summary
+from validation import QualityLog, cell_checks, validate_rows
+
+# The word-box extractor handles every archived layout; camelot is an optional
+# fallback for a report it finds nothing in, imported (with OpenCV and
+# Ghostscript) only when that fallback actually runs
+HAVE_CAMELOT = importlib.util.find_spec("camelot") is not None
 
 REPORTS_DIR = "reports"
 OUTPUT_CSV  = "hydrocatchment_summary.csv"
+MANIFEST_JSON = "hydro_manifest.json"
+
+# Bump whenever a parsing change should re-process already-summarised reports
+PARSER_VERSION = "2"   # 2: word-box extractor replaces camelot as the primary parser
 
 # Fixed English station columns (order)
 STATIONS = [
@@ -23,6 +33,7 @@ STATIONS = [
     "Bowatenna", "Ukuwela", "Samanala Wewa", "Kukuleganga",
     "Maskeliya (DOM)", "Inginiyagala"
 ]
+SUMMARY_COLUMNS = ["Date"] + STATIONS + ["Total", "Max", "Min"]
 
 def _key(s: str) -> str:
     return re.sub(r"[^a-z]", "", (s or "").lower())
@@ -47,24 +58,23 @@ ALIASES = {
     "maskeliyadom": "Maskeliya (DOM)", "maskeliya(dom)": "Maskeliya (DOM)", "maskeliya": "Maskeliya (DOM)",
     "inginiyagala": "Inginiyagala",
 }
-ALLOWED = set(STATIONS)
 
-TOKEN = r"(?:(?i:NA|TRACE|T\W*R)|\d+(?:\.\d+)?)"
-TOKEN_RE = re.compile(TOKEN)
+# Name then one value (optionally "mm") for the text fallback, compiled once
+PAIR_SCANNER = RowScanner(r"[A-Za-z()\- ]{3,}?", 1, suffix=r"(?:\s*mm)?")
 
 def english_only(s: str) -> str:
     parts = re.findall(r"[A-Za-z()\- ]+", s or "")
     return re.sub(r"\s+", " ", " ".join(parts)).strip()
 
+# Memoised band results are only valid for this parser and these stations
+MEMO_SALT = f"{PARSER_VERSION}:{fingerprint(STATIONS, ALIASES)}"
+
+# Exact matching only: aliases first, then the station names themselves
+MATCHER = StationMatcher(STATIONS, ALIASES, key=lambda s: _key(english_only(s)), cutoff=None)
+
 def canon_station(name: str) -> str:
-    k = _key(english_only(name))
-    if k in ALIASES:
-        c = ALIASES[k]
-        return c if c in ALLOWED else ""
-    for c in STATIONS:
-        if _key(c) == k:
-            return c
-    return ""
+    with stage("match"):
+        return MATCHER.match(name) or ""
 
 def norm_val(v: str) -> str:
     raw = ("" if v is None else str(v)).strip()
@@ -82,32 +92,12 @@ def norm_val(v: str) -> str:
     except Exception:
         return ""
 
-def actual_date_from_pdf(pdf_path: str, fallback: str) -> str:
-    """Header date minus 1 day; fallback to folder date (YYYY-MM-DD)."""
-    out = fallback
-    try:
-        with open(pdf_path, "rb") as f:
-            r = PyPDF2.PdfReader(f)
-            txt = "".join(p.extract_text() or "" for p in r.pages)
-        m = re.search(r"(\d{4}[./-]\d{2}[./-]\d{2})", txt)
-        if m:
-            hdr = m.group(1).replace("/", "-").replace(".", "-")
-            pub = datetime.strptime(hdr, "%Y-%m-%d")
-            out = (pub - timedelta(days=1)).strftime("%Y-%m-%d")
-    except Exception:
-        pass
-    return out
-
-def pages_with_hydro(pdf_path: str) -> List[int]:
-    pgs = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, p in enumerate(pdf.pages, start=1):
-            t = (p.extract_text() or "").lower()
-            if "hydro catchment" in t:
-                pgs.append(i)
-    return pgs
-
-def parse_hydro_with_camelot(pdf_path: str, pages: List[int]) -> Dict[str, str]:
+def pages_with_hydro(doc: ReportDocument) -> List[int]:
+    return doc.pages_with("hydro")
+
+def parse_hydro_with_camelot(doc: ReportDocument, pages: List[int],
+                             flavors=("lattice", "stream")) -> Dict[str, str]:
+    """Station values from camelot tables; the first flavor that finds any table is used."""
     if not HAVE_CAMELOT or not pages:
         return {}
     acc: Dict[str, str] = {}
@@ -115,10 +105,15 @@ def parse_hydro_with_camelot(pdf_path: str, pages: List[int]) -> Dict[str, str]:
 
     def read_tables(flavor: str):
         try:
-            return camelot.read_pdf(pdf_path, pages=page_spec, flavor=flavor, strip_text=" \n")
+            import camelot
+            return camelot.read_pdf(doc.path, pages=page_spec, flavor=flavor, strip_text=" \n")
         except Exception:
             return []
-    tables = read_tables("lattice") or read_tables("stream")
+    tables = []
+    for flavor in flavors:
+        tables = read_tables(flavor)
+        if tables:
+            break
 
     for tb in tables:
         df = tb.df.replace(r"\s+", " ", regex=True).fillna("")
@@ -149,109 +144,213 @@ def parse_hydro_with_camelot(pdf_path: str, pages: List[int]) -> Dict[str, str]:
                     i += 1
     return acc
 
-def parse_hydro_with_text(pdf_path: str, pages: List[int]) -> Dict[str, str]:
+def _is_value(w: dict) -> bool:
+    return TOKEN_RE.fullmatch(w["text"]) is not None
+
+def station_before(name_words: List[dict]) -> str:
+    """Station named by the words left of a value: the longest trailing run that matches (so 'Upper Kotmale' beats 'Kotmale')."""
+    for k in range(len(name_words), 0, -1):
+        st = canon_station(" ".join(w["text"] for w in name_words[-k:]))
+        if st:
+            return st
+    return ""
+
+def pair_band(body: List[dict]) -> Dict[str, str]:
+    """Station -> value for one band of word boxes (first value per station wins)."""
     acc: Dict[str, str] = {}
-    with pdfplumber.open(pdf_path) as pdf:
-        for pno in pages:
-            page = pdf.pages[pno - 1]
-            text = page.extract_text() or ""
-            low = text.lower()
-            s = low.find("hydro catchment")
-            if s == -1: 
+    value_cols = columns(body, _is_value)
+    for row in group_rows(body):
+        left = float("-inf")
+        for x0, x1 in value_cols:
+            values = [w for w in row if w["x0"] >= x0 - 1 and w["x1"] <= x1 + 1 and _is_value(w)]
+            names = [w for w in row if w["x0"] >= left and w["x1"] <= x0 and not _is_value(w)]
+            left = x1
+            if not values:
+                continue
+            st = station_before(names)
+            if not st:
                 continue
-            e = min([x for x in [
-                low.find("meteorological stations", s+1),
-                low.find("rainfall stations", s+1),
-                low.find("other rainfall stations", s+1),
-                low.find("appendix", s+1),
-                low.find("reservoir", s+1),
-            ] if x != -1] or [len(text)])
-            block = text[s:e]
-
-            pair = re.compile(rf"([A-Za-z()\- ]{{3,}}?)\s+({TOKEN})(?:\s*mm)?")
-            for m in pair.finditer(block):
-                name = english_only(m.group(1))
-                st = canon_station(name)
-                if not st:
-                    continue
-                v = norm_val(m.group(2))
-                if v != "" and st not in acc:
-                    acc[st] = v
+            v = norm_val(values[0]["text"])
+            if v != "" and st not in acc:
+                acc[st] = v
     return acc
 
-def compute_stats(row: dict) -> None:
-    nums = []
-    for s in STATIONS:
-        v = row.get(s, "")
-        if v in ("", "NA"):
+def parse_hydro_with_words(doc: ReportDocument, pages: List[int]) -> Dict[str, str]:
+    """
+    Geometric pairing on pdfplumber word boxes, limited to the hydro section's
+    band from the section index: value cells form columns by x-position, and
+    each value's station is the English text on the same row between the
+    previous value column and it.
+    """
+    acc: Dict[str, str] = {}
+    for pno, body in doc.section_words("hydro"):
+        if pno + 1 not in pages:
             continue
-        try:
-            nums.append(float(v))
-        except Exception:
-            pass
-    if nums:
-        row["Total"] = round(sum(nums), 1)
-        row["Max"]   = round(max(nums), 1)
-        row["Min"]   = round(min(nums), 1)
-    else:
-        row["Total"] = row["Max"] = row["Min"] = ""
-
-def main():
-    rows: List[dict] = []
+        section = [[w["text"], w["x0"], w["x1"], w["top"], w["bottom"]] for w in body]
+        for st, v in memoized("hydro", MEMO_SALT, section, lambda: pair_band(body)).items():
+            acc.setdefault(st, v)
+    return acc
 
-    for date_folder in sorted(os.listdir(REPORTS_DIR)):
-        folder = os.path.join(REPORTS_DIR, date_folder)
-        if not os.path.isdir(folder): 
-            continue
-        pdf_path = os.path.join(folder, f"weather-{date_folder}.pdf")
-        if not os.path.exists(pdf_path):
+def parse_hydro_with_text(doc: ReportDocument, pages: List[int]) -> Dict[str, str]:
+    acc: Dict[str, str] = {}
+    for pno in pages:
+        text = doc.page_text(pno - 1)
+        low = text.lower()
+        s = doc.sections(pno - 1).get("hydro", -1)
+        if s == -1: 
             continue
+        e = min([x for x in [
+            low.find("meteorological stations", s+1),
+            low.find("rainfall stations", s+1),
+            low.find("other rainfall stations", s+1),
+            low.find("appendix", s+1),
+            low.find("reservoir", s+1),
+        ] if x != -1] or [len(text)])
+        block = text[s:e]
 
-        pages = pages_with_hydro(pdf_path)
-        if not pages:
-            continue
+        for _, raw, (value,) in PAIR_SCANNER.scan(block):
+            st = canon_station(english_only(raw))
+            if not st:
+                continue
+            v = norm_val(value)
+            if v != "" and st not in acc:
+                acc[st] = v
+    return acc
 
-        data: Dict[str, str] = {}
-        data.update(parse_hydro_with_camelot(pdf_path, pages))
-        if not data:
-            data.update(parse_hydro_with_text(pdf_path, pages))
+def read_hydro(doc: ReportDocument, pages: List[int]) -> Dict[str, str]:
+    """Word boxes first, then camelot (if installed), then the text regex."""
+    data: Dict[str, str] = {}
+    data.update(parse_hydro_with_words(doc, pages))
+    if not data and HAVE_CAMELOT:
+        count("hydro_camelot_fallbacks")
+        data.update(parse_hydro_with_camelot(doc, pages))
+    if not data:
+        count("hydro_text_fallbacks")
+        data.update(parse_hydro_with_text(doc, pages))
+    return data
 
-        act_date = actual_date_from_pdf(pdf_path, date_folder)
+def hydro_row(doc: ReportDocument, date_folder: str, ocr: bool = True) -> Optional[dict]:
+    """
+    Date and station values for one report; None if it has no hydro section.
+    A report whose text layer has no hydro section or no values in it is read
+    again from OCR.
+    """
+    with stage("parse"):
+        pages = pages_with_hydro(doc)
+        data = read_hydro(doc, pages) if pages else {}
+        if ocr and not data and doc.apply_ocr("hydro"):
+            count("hydro_ocr_retries")
+            pages = pages_with_hydro(doc)
+            data = read_hydro(doc, pages) if pages else {}
+        if not pages:
+            count("hydro_missing_sections")
+            return None
 
-        row = {"Date": act_date}
+        row = {"Date": doc.actual_date(date_folder)}
         for st in STATIONS:
             row[st] = data.get(st, "")
-        compute_stats(row)
-        rows.append(row)
+    count("hydro_empty_cells", sum(1 for st in STATIONS if row[st] == ""))
+    return row
 
+def process_folder(date_folder: str) -> Tuple[Optional[dict], dict]:
+    """(row, metrics). Runs in worker processes; only reads the PDF."""
+    with collecting(date_folder) as metrics, ReportDocument(report_pdf(REPORTS_DIR, date_folder)) as doc:
+        row = hydro_row(doc, date_folder)
+    return row, metrics.as_dict()
+
+def history_store(root: str):
+    """Hydro dataset in the optional Parquet history (see history_store.py)."""
+    from history_store import HistoryStore
+    return HistoryStore(root, "hydro", STATIONS)
+
+def export_history(store, dates: Optional[List[str]] = None) -> None:
+    """
+    Write OUTPUT_CSV from the history store through write_summary: just
+    `dates`, or the whole store, dropping CSV days the store does not have.
+    """
+    if dates is None:
+        df = store.read_wide()
+        days = set(df["Date"]) | summary_dates(OUTPUT_CSV)
+    else:
+        df = store.read_wide(min(dates), max(dates))
+        df, days = df[df["Date"].isin(dates)], set(dates)
+    df = add_stats(df, STATIONS, {"Total": "sum", "Max": "max", "Min": "min"})
+    df = write_summary(OUTPUT_CSV, df, ["Date"], SUMMARY_COLUMNS, replace_days=True, days=days)
+    print(f"[hydro] Saved {OUTPUT_CSV} — {len(df)} rows (exported from {store.root})")
+
+def save_summary(rows: List[dict], store=None, quality: Optional[QualityLog] = None) -> None:
+    """
+    Merge rows into OUTPUT_CSV as Date, stations..., Total, Max, Min (via the
+    history store if given). Chunked runs pass a QualityLog that checks each
+    chunk and is flushed once.
+    """
     if not rows:
         print("[hydro] No rows produced.")
         return
 
+    with stage("validate"):
+        if quality is None:
+            flags = validate_rows("hydro", pd.DataFrame(rows), STATIONS)
+        else:
+            flags = quality.check(pd.DataFrame(rows))
+
+    if store is not None:
+        with stage("write"):
+            export_history(store, store.write_rows(rows, cell_checks(flags)))
+        return
+
     # Build new DF in required order: Date, stations..., Total, Max, Min
-    ordered_cols = ["Date"] + STATIONS + ["Total", "Max", "Min"]
-    df_new = pd.DataFrame(rows).reindex(columns=ordered_cols)
-
-    # Merge with old CSV; drop any legacy "Average" column, then enforce order
-    if os.path.exists(OUTPUT_CSV):
-        old = pd.read_csv(OUTPUT_CSV)
-        if "Average" in old.columns:
-            old = old.drop(columns=["Average"])
-        # ensure all required columns exist
-        for c in ordered_cols:
-            if c not in old.columns:
-                old[c] = ""  # backfill missing
-        old = old[ordered_cols]
-        df = pd.concat([old, df_new], ignore_index=True)
-        df.drop_duplicates(subset=["Date"], keep="last", inplace=True)
-        df = df[ordered_cols]
-    else:
-        df = df_new
+    ordered_cols = SUMMARY_COLUMNS
+    with stage("aggregate"):
+        df_new = pd.DataFrame(rows).reindex(columns=["Date"] + STATIONS)
+        df_new = add_stats(df_new, STATIONS, {"Total": "sum", "Max": "max", "Min": "min"})
 
-    df.sort_values(["Date"], inplace=True, ignore_index=True)
-    df.to_csv(OUTPUT_CSV, index=False)
+    # Upsert into old CSV; reindexing drops any legacy "Average" column and adds missing ones empty
+    with stage("write"):
+        df = write_summary(OUTPUT_CSV, df_new, ["Date"], ordered_cols)
     print(f"[hydro] Saved {OUTPUT_CSV} — {len(df)} rows, columns={list(df.columns)}")
 
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build hydrocatchment_summary.csv from reports/<date>/weather-<date>.pdf")
+    ap.add_argument("--full-rebuild", action="store_true",
+                    help="ignore the manifest and re-parse every report")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="parse reports in N processes (0 = one per CPU)")
+    ap.add_argument("--chunk-size", type=int, default=0,
+                    help="merge into the CSV every N reports to bound memory (0 = all at once)")
+    ap.add_argument("--metrics", metavar="FILE", default=os.environ.get("METEO_METRICS"),
+                    help="append per-report and per-run metrics as JSON lines (default: $METEO_METRICS)")
+    args = ap.parse_args(argv)
+    log = MetricsLog(args.metrics, "hydro")
+    with activated(log.metrics):
+        run(args, log)
+    log.close()
+
+def run(args, log):
+    manifest = ReportManifest(MANIFEST_JSON, PARSER_VERSION)
+    known_dates = None if args.full_rebuild else summary_dates(OUTPUT_CSV)
+
+    todo = [d for d in report_folders(REPORTS_DIR)
+            if known_dates is None or not manifest.is_current(report_pdf(REPORTS_DIR, d), known_dates)]
+
+    # map_reports keeps folder order, so the result matches the serial run exactly;
+    # each chunk is merged and recorded before the next one is parsed
+    quality = QualityLog("hydro", STATIONS)
+    for chunk in chunked(todo, args.chunk_size):
+        results = []
+        for date_folder, (row, metrics) in zip(chunk, map_reports(process_folder, chunk, args.workers)):
+            log.report(date_folder, metrics)
+            results.append(row)
+        save_summary([r for r in results if r], quality=quality)
+
+        for date_folder, row in zip(chunk, results):
+            manifest.record(report_pdf(REPORTS_DIR, date_folder), [row["Date"]] if row else [])
+        manifest.prune()
+        manifest.save()
+
+    with stage("validate"):
+        quality.flush()
+
 if __name__ == "__main__":
     print(f"[hydro] CWD={os.getcwd()}  reports={os.path.abspath(REPORTS_DIR)}")
     main()
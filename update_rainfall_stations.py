@@ -0,0 +1,187 @@
+# update_rainfall_stations.py (long form: Date, Station, Value, Flag)
+#
+# The "Other Rainfall Stations" table lists a different set of AWS / estate
+# gauges every day, so it is kept long, one row per (date, station), with the
+# stations themselves in a growing registry (see station_registry.py).
+import os, re, argparse
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from cell_values import safe_number
+from history_store import encode_cell
+from report_document import ReportDocument
+from report_manifest import ReportManifest, summary_dates
+from report_pool import chunked, map_reports, report_folders, report_pdf
+from row_scanner import TOKEN_RE
+from run_metrics import MetricsLog, activated, collecting, count, stage
+from section_memo import memoized
+from station_registry import StationRegistry, display_name
+from summary_table import write_summary
+from word_layout import columns, group_rows
+
+REPORTS_DIR = "reports"
+OUTPUT_CSV = "rainfall_summary.csv"
+REGISTRY_CSV = "rainfall_stations.csv"
+MANIFEST_JSON = "rainfall_manifest.json"
+
+# Bump whenever a parsing change should re-process already-summarised reports
+PARSER_VERSION = "1"
+
+SUMMARY_COLUMNS = ["Date", "Station", "Value", "Flag"]
+
+# pdfplumber does not always split a Tamil name from the English one after it
+# ("எஸ்நடட்Dyraba"), nor a name from its value ("(ARG)17.0")
+SCRIPT_RUN_RE = re.compile(r"[\x00-\x7f]+|[^\x00-\x7f]+")
+GLUED_VALUE_RE = re.compile(r"(.*\))(\d+(?:\.\d+)?)")
+NAME_WORD_RE = re.compile(r"[A-Za-z()\-.'&]*[A-Za-z][A-Za-z()\-.'&]*|[()]")
+# The header's "mm" unit can land on the first row; overlapping glyphs read as "aMteo"
+UNIT_WORDS = {"mm"}
+GARBLED_RE = re.compile(r"[a-z][A-Z]")
+
+def split_word(w: dict) -> List[dict]:
+    """One word box cut into script runs and a trailing glued value, x-positions shared out by characters."""
+    text = w["text"]
+    parts = SCRIPT_RUN_RE.findall(text)
+    m = GLUED_VALUE_RE.fullmatch(parts[-1])
+    if m:
+        parts[-1:] = [m.group(1), m.group(2)]
+    if len(parts) == 1:
+        return [w]
+    out, start = [], 0
+    per_char = (w["x1"] - w["x0"]) / len(text)
+    for part in parts:
+        out.append({**w, "text": part, "x0": w["x0"] + start * per_char,
+                    "x1": w["x0"] + (start + len(part)) * per_char})
+        start += len(part)
+    return out
+
+def _is_value(w: dict) -> bool:
+    return TOKEN_RE.fullmatch(w["text"]) is not None
+
+def english_name(name_words: List[dict]) -> str:
+    """The English name at the end of a cell (after the Sinhala and Tamil ones); "" if there is none."""
+    run = []
+    for w in reversed(name_words):
+        if not NAME_WORD_RE.fullmatch(w["text"]):
+            break
+        if w["text"].lower() not in UNIT_WORDS:
+            run.append(w["text"])
+    name = display_name(" ".join(reversed(run)))
+    if GARBLED_RE.search(name) or len(re.sub(r"[^A-Za-z]", "", name)) < 3:
+        return ""
+    return name
+
+def pair_band(band: List[dict]) -> List[Tuple[str, str]]:
+    """(name, value) pairs of one band of word boxes, in table order (a name may repeat)."""
+    pairs: List[Tuple[str, str]] = []
+    body = [part for w in band for part in split_word(w)]
+    value_cols = columns(body, _is_value)
+    for row in group_rows(body):
+        left = float("-inf")
+        for x0, x1 in value_cols:
+            values = [w for w in row if w["x0"] >= x0 - 1 and w["x1"] <= x1 + 1 and _is_value(w)]
+            names = [w for w in row if w["x0"] >= left and w["x1"] <= x0 and not _is_value(w)]
+            left = x1
+            if not values:
+                continue
+            name = english_name(names)
+            v = safe_number(values[0]["text"], is_rainfall=True)
+            if name and v != "":
+                pairs.append((name, v))
+    return pairs
+
+def parse_rainfall(doc: ReportDocument) -> List[Tuple[str, str]]:
+    """
+    (English station name, value) pairs from the rainfall section's word
+    boxes, in table order, first occurrence of a name winning. Pairing works
+    as for the hydro table: values form columns by x-position and a value's
+    name is the English text on its row between the previous value column
+    and it. Each band's pairs are memoised by its word boxes; they are raw
+    report names (the registry resolves them later, in the main process), so
+    only the parser version salts the memo.
+    """
+    pairs: List[Tuple[str, str]] = []
+    seen = set()
+    for _, band in doc.section_words("rainfall"):
+        section = [[w["text"], w["x0"], w["x1"], w["top"], w["bottom"]] for w in band]
+        for name, v in memoized("rainfall", PARSER_VERSION, section, lambda: pair_band(band)):
+            if name not in seen:
+                seen.add(name)
+                pairs.append((name, v))
+    return pairs
+
+def rainfall_pairs(doc: ReportDocument, date_folder: str, ocr: bool = True) -> Tuple[str, List[Tuple[str, str]]]:
+    """(date, pairs) for one report; a rainfall section that reads as empty is tried again from OCR."""
+    with stage("parse"):
+        pairs = parse_rainfall(doc)
+        if ocr and not pairs and doc.pages_with("rainfall") and doc.apply_ocr("rainfall"):
+            count("rainfall_ocr_retries")
+            pairs = parse_rainfall(doc)
+    count("rainfall_values", len(pairs))
+    return doc.actual_date(date_folder), pairs
+
+def process_folder(date_folder: str) -> Tuple[str, List[Tuple[str, str]], dict]:
+    """(date, pairs, metrics). Runs in worker processes; only reads the PDF."""
+    with collecting(date_folder) as metrics, ReportDocument(report_pdf(REPORTS_DIR, date_folder)) as doc:
+        date, pairs = rainfall_pairs(doc, date_folder)
+    return date, pairs, metrics.as_dict()
+
+def long_rows(date: str, pairs: List[Tuple[str, str]], registry: StationRegistry) -> List[dict]:
+    """Long rows for one report, station names resolved (and new ones registered) in the registry."""
+    rows = []
+    for name, text in pairs:
+        value, flag = encode_cell(text)
+        rows.append({"Date": date, "Station": registry.resolve(name, date),
+                     "Value": "" if value is None else str(value), "Flag": flag})
+    return rows
+
+def save_summary(rows: List[dict], registry: StationRegistry) -> None:
+    """Replace the parsed days in OUTPUT_CSV and save the registry."""
+    registry.save()
+    if not rows:
+        print("[rainfall] No rows produced.")
+        return
+    with stage("write"):
+        df = write_summary(OUTPUT_CSV, pd.DataFrame(rows), ["Date", "Station"], SUMMARY_COLUMNS,
+                           replace_days=True)
+    print(f"[rainfall] Saved {OUTPUT_CSV} — {len(df)} rows, {len(registry.stations)} stations")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build rainfall_summary.csv from reports/<date>/weather-<date>.pdf")
+    ap.add_argument("--full-rebuild", action="store_true",
+                    help="ignore the manifest and re-parse every report")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="parse reports in N processes (0 = one per CPU)")
+    ap.add_argument("--chunk-size", type=int, default=0,
+                    help="merge into the CSV every N reports to bound memory (0 = all at once)")
+    ap.add_argument("--metrics", metavar="FILE", default=os.environ.get("METEO_METRICS"),
+                    help="append per-report and per-run metrics as JSON lines (default: $METEO_METRICS)")
+    args = ap.parse_args(argv)
+    log = MetricsLog(args.metrics, "rainfall")
+    with activated(log.metrics):
+        run(args, log)
+    log.close()
+
+def run(args, log):
+    manifest = ReportManifest(MANIFEST_JSON, PARSER_VERSION)
+    known_dates = None if args.full_rebuild else summary_dates(OUTPUT_CSV)
+    registry = StationRegistry(REGISTRY_CSV)
+
+    todo = [d for d in report_folders(REPORTS_DIR)
+            if known_dates is None or not manifest.is_current(report_pdf(REPORTS_DIR, d), known_dates)]
+
+    for chunk in chunked(todo, args.chunk_size):
+        rows, parsed = [], []
+        # Registry updates happen here, in folder order, so new stations get the same names serially or in parallel
+        for date_folder, (date, pairs, metrics) in zip(chunk, map_reports(process_folder, chunk, args.workers)):
+            log.report(date_folder, metrics)
+            rows.extend(long_rows(date, pairs, registry))
+            parsed.append((report_pdf(REPORTS_DIR, date_folder), [date] if pairs else []))
+        save_summary(rows, registry)
+
+        for pdf, dates in parsed:
+            manifest.record(pdf, dates)
+        manifest.prune()
+        manifest.save()
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
 import os
 import re
-import pdfplumber
+import argparse
 import pandas as pd
-import PyPDF2
-from difflib import get_close_matches
 from datetime import datetime, timedelta, date
+from cell_values import safe_number
+from report_manifest import ReportManifest, summary_dates
+from report_document import ReportDocument
+from report_pool import chunked, map_reports, report_folders, report_pdf
+from row_scanner import RowScanner, TOKEN, TOKEN_RE
+from run_metrics import MetricsLog, activated, collecting, count, stage
+from section_memo import fingerprint, memoized
+from station_matcher import StationMatcher
+from summary_table import add_stats, write_summary
+from validation import QualityLog, cell_checks, validate_rows
 
 # === CONFIG ===
 reports_folder = "reports"
 summary_file = "weather_summary.csv"
+manifest_file = "weather_manifest.json"
+
+# Bump whenever a parsing change should re-process already-summarised reports
+PARSER_VERSION = "1"
 
 known_stations = [
     "Anuradhapura", "Badulla", "Bandarawela", "Batticaloa", "Colombo", "Galle",
@@ -18,6 +30,8 @@ known_stations = [
     "Mullaitivu"
 ]
 
+SUMMARY_COLUMNS = ["Date", "Type"] + known_stations + ["Average", "Max", "Min"]
+
 # Aliases seen in PDFs
 station_aliases = {
     "Maha llluppallama": "Maha Illuppallama",
@@ -27,49 +41,25 @@ station_aliases = {
     "Katugashota": "Katugasthota",
 }
 
-# One cell can be a number or NA / TRACE / TR (with possible punctuation/space between T and R)
-TOKEN = r"(?:(?i:NA|TRACE|T\W*R)|\d+(?:\.\d+)?)"
-TOKEN_RE = re.compile(TOKEN)
-
-def safe_number(v, is_rainfall=False):
-    raw = str(v).strip()
-    up = raw.upper()
-    # normalize variants like "T R", "T.R" etc.
-    letters_only = re.sub(r"[^A-Z]", "", up)
-
-    if letters_only == "NA":
-        return "NA"
-    if letters_only in ("TR", "TRACE"):
-        return "0.01"
-
-    # dept sometimes prints dashes
-    if up in ["-", "--"]:
-        return "0.0" if is_rainfall else ""
-
-    # OCR fixes
-    cleaned = raw.replace("O", "0").replace("|", "1").replace("I", "1").replace("l", "1")
-    cleaned = re.sub(r"[^\d.]", "", cleaned)
-    if cleaned in ("", "."):
-        return ""
-
-    try:
-        f = float(cleaned)
-        if not is_rainfall and (f < -10 or f > 60):
-            return ""
-        return str(f)
-    except:
-        return ""
+# Below this share of filled cells the text layer is taken to be missing or garbled, and OCR is tried
+OCR_MIN_FILLED = 0.25
+
+# Title-cased exact/alias hit first, then fuzzy (difflib ratio >= 0.3) fallback
+station_matcher = StationMatcher(known_stations, station_aliases, cutoff=0.3)
+
+# Memoised block results are only valid for this parser and these stations
+MEMO_SALT = f"{PARSER_VERSION}:{fingerprint(known_stations, station_aliases)}"
+
+# Station, Max, Min, Rainfall rows (PASS A's rule) and wrapped rows (PASS B's) in one walk
+ROW_SCANNER = RowScanner(r"[A-Za-z][A-Za-z ]+?", 3, known_stations)
+PASS_A_RE = re.compile(rf"([A-Za-z][A-Za-z ]+?)\s+({TOKEN})\s+({TOKEN})\s+({TOKEN})")
 
 def match_station(name):
-    name = name.strip().title()
-    if name in station_aliases:
-        return station_aliases[name]
-    best = get_close_matches(name.lower(), [s.lower() for s in known_stations], n=1, cutoff=0.3)
-    if best:
-        for s in known_stations:
-            if s.lower() == best[0]:
-                return s
-    return None
+    with stage("match"):
+        station, score = station_matcher.match_with_score(name)
+    if station and score < 1.0:
+        count("fuzzy_matches")
+    return station
 
 def meteorological_block(text: str) -> str:
     """Extract only the Meteorological Stations table block."""
@@ -119,6 +109,7 @@ def add_na_rows_for_missing_dates(new_rows, summary_file):
         return new_rows
 
     # Append NA rows for each missing date
+    count("na_fill_days", len(missing))
     for d in missing:
         row_max = {"Date": d, "Type": "Max"}
         row_min = {"Date": d, "Type": "Min"}
@@ -133,76 +124,118 @@ def add_na_rows_for_missing_dates(new_rows, summary_file):
 
 # ------------------ MAIN ------------------
 
-new_rows = []
-
-for date_folder in sorted(os.listdir(reports_folder)):
-    folder = os.path.join(reports_folder, date_folder)
-    if not os.path.isdir(folder):
-        continue
-
-    pdf = os.path.join(folder, f"weather-{date_folder}.pdf")
-    if not os.path.exists(pdf):
-        continue
-
-    print(f"\nProcessing: {pdf}")
-
+def structured_pass(text, found, unmatched, actual_date):
+    """PASS A: Station, Max, Min, Rainfall on one line. `found` is (max, min, rain) dicts, updated in place."""
+    valid_max, valid_min, valid_rain = found
+    for m in PASS_A_RE.finditer(text):
+        st_raw, max_raw, min_raw, rain_raw = m.group(1, 2, 3, 4)
+        count("regex_hits")
+        station = match_station(st_raw)
+        if station:
+            max_val  = safe_number(max_raw)
+            min_val  = safe_number(min_raw)
+            rain_val = safe_number(rain_raw, is_rainfall=True)
+            if max_val != "":  valid_max[station]  = max_val
+            if min_val != "":  valid_min[station]  = min_val
+            if rain_val != "": valid_rain[station] = rain_val
+        else:
+            count("unmatched_names")
+            unmatched.append(f"{actual_date} | NO MATCH: {st_raw}\n")
+
+def line_wrap_pass(text, found):
+    """PASS B: station names whose values wrap onto the next line; only fills cells PASS A left empty."""
+    valid_max, valid_min, valid_rain = found
+    lines = [ln.strip() for ln in text.split("\n") if ln.strip()]
+    for i, line in enumerate(lines):
+        hit = station_matcher.find_in(line)
+        if not hit:
+            continue
+        combo = line + (" " + lines[i + 1] if i + 1 < len(lines) else "")
+        right = combo.split(hit, 1)[1] if hit in combo else combo
+        tokens = TOKEN_RE.findall(right)
+        if len(tokens) >= 3:
+            count("wrap_hits")
+            max_raw, min_raw, rain_raw = tokens[0], tokens[1], tokens[2]
+            max_val  = safe_number(max_raw)
+            min_val  = safe_number(min_raw)
+            rain_val = safe_number(rain_raw, is_rainfall=True)
+            if hit not in valid_max and max_val != "":   valid_max[hit]  = max_val
+            if hit not in valid_min and min_val != "":   valid_min[hit]  = min_val
+            if hit not in valid_rain and rain_val != "": valid_rain[hit] = rain_val
+
+def scan_pass(text, found, wrapped, unmatched_names):
+    """
+    Both rules in one ROW_SCANNER walk. Rows set `found` (last wins, as PASS
+    A); wrapped values go to `wrapped` (first wins, as PASS B) and are only
+    used for cells no row filled, which is what running A then B gives.
+    Row names that match no station go to `unmatched_names`.
+    """
+    # A station whose three cells a row already filled keeps them, so its wrapped values are never read
+    def wanted(station):
+        return not all(station in cell for cell in found)
+
+    for kind, name, (max_raw, min_raw, rain_raw) in ROW_SCANNER.scan(text, wanted):
+        if kind == "row":
+            count("regex_hits")
+            station = match_station(name)
+            if not station:
+                count("unmatched_names")
+                unmatched_names.append(name)
+                continue
+            cells = zip(found, (safe_number(max_raw), safe_number(min_raw), safe_number(rain_raw, is_rainfall=True)))
+            for cell, val in cells:
+                if val != "":
+                    cell[station] = val
+        else:
+            count("wrap_hits")
+            cells = zip(wrapped, (safe_number(max_raw), safe_number(min_raw), safe_number(rain_raw, is_rainfall=True)))
+            for cell, val in cells:
+                if val != "" and name not in cell:
+                    cell[name] = val
+
+def scan_block(text):
+    """scan_pass over one block from empty cells, as ([max, min, rain], [wrapped x3], unmatched names); memoised."""
+    def parse():
+        found, wrapped, names = ({}, {}, {}), ({}, {}, {}), []
+        scan_pass(text, found, wrapped, names)
+        return [list(found), list(wrapped), names]
+    return memoized("weather", MEMO_SALT, text, parse)
+
+def read_rows(doc, date_folder, unmatched, passes=None):
+    """
+    Max / Min / Rainfall rows from the document's current text layer: the
+    single-pass scanner by default, or the legacy PASS A / PASS B regexes
+    given passes="A", "B" or "AB".
+    """
     # Detect actual date from header (then minus one day)
-    actual_date = date_folder
-    try:
-        with open(pdf, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            all_text = "".join(page.extract_text() or "" for page in reader.pages)
-            date_match = re.search(r"(\d{4}[./-]\d{2}[./-]\d{2})", all_text)
-            if date_match:
-                header_date = date_match.group(0).replace("/", "-").replace(".", "-")
-                published = datetime.strptime(header_date, "%Y-%m-%d")
-                actual_date = (published - timedelta(days=1)).strftime("%Y-%m-%d")
-    except Exception:
-        pass
+    actual_date = doc.actual_date(date_folder)
 
     valid_max, valid_min, valid_rain = {}, {}, {}
-    log_path = os.path.join(folder, "unmatched_stations.log")
-    unmatched_log = open(log_path, "a", encoding="utf-8")
-
-    with pdfplumber.open(pdf) as pdf_obj:
-        for page in pdf_obj.pages:
-            full_text = page.extract_text() or ""
-            text = meteorological_block(full_text)
-
-            # PASS A: structured capture — Station, Max, Min, Rainfall
-            patt = re.compile(rf"([A-Za-z][A-Za-z ]+?)\s+({TOKEN})\s+({TOKEN})\s+({TOKEN})")
-            for m in patt.finditer(text):
-                st_raw, max_raw, min_raw, rain_raw = m.group(1, 2, 3, 4)
-                station = match_station(st_raw)
-                if station:
-                    max_val  = safe_number(max_raw)
-                    min_val  = safe_number(min_raw)
-                    rain_val = safe_number(rain_raw, is_rainfall=True)
-                    if max_val != "":  valid_max[station]  = max_val
-                    if min_val != "":  valid_min[station]  = min_val
-                    if rain_val != "": valid_rain[station] = rain_val
-                else:
-                    unmatched_log.write(f"{actual_date} | NO MATCH: {st_raw}\n")
-
-            # PASS B: line-wrap fallback — use next line as continuation
-            lines = [ln.strip() for ln in text.split("\n") if ln.strip()]
-            for i, line in enumerate(lines):
-                hit = next((s for s in known_stations if s in line), None)
-                if not hit:
-                    continue
-                combo = line + (" " + lines[i + 1] if i + 1 < len(lines) else "")
-                right = combo.split(hit, 1)[1] if hit in combo else combo
-                tokens = TOKEN_RE.findall(right)
-                if len(tokens) >= 3:
-                    max_raw, min_raw, rain_raw = tokens[0], tokens[1], tokens[2]
-                    max_val  = safe_number(max_raw)
-                    min_val  = safe_number(min_raw)
-                    rain_val = safe_number(rain_raw, is_rainfall=True)
-                    if hit not in valid_max and max_val != "":   valid_max[hit]  = max_val
-                    if hit not in valid_min and min_val != "":   valid_min[hit]  = min_val
-                    if hit not in valid_rain and rain_val != "": valid_rain[hit] = rain_val
-
-    unmatched_log.close()
+    found = (valid_max, valid_min, valid_rain)
+    wrapped = ({}, {}, {})
+
+    # Only pages the section index places the table on; all pages if it found no heading
+    met_pages = [p - 1 for p in doc.pages_with("meteorological")] or range(doc.page_count)
+    for pno in met_pages:
+        full_text = doc.page_text(pno)
+        text = meteorological_block(full_text)
+        if passes is None:
+            # Blocks are scanned on their own and folded in: rows last-wins, wrapped values first-wins
+            block_found, block_wrapped, names = scan_block(text)
+            for cell, block in zip(found, block_found):
+                cell.update(block)
+            for cell, block in zip(wrapped, block_wrapped):
+                for station, val in block.items():
+                    cell.setdefault(station, val)
+            unmatched.extend(f"{actual_date} | NO MATCH: {name}\n" for name in names)
+            continue
+        if "A" in passes:
+            structured_pass(text, found, unmatched, actual_date)
+        if "B" in passes:
+            line_wrap_pass(text, found)
+    for cell, extra in zip(found, wrapped):
+        for station, val in extra.items():
+            cell.setdefault(station, val)
 
     # Build rows for this date
     row_max = {"Date": actual_date, "Type": "Max"}
@@ -212,45 +245,158 @@ for date_folder in sorted(os.listdir(reports_folder)):
         row_max[s]  = valid_max.get(s, "")
         row_min[s]  = valid_min.get(s, "")
         row_rain[s] = valid_rain.get(s, "")
-    new_rows.extend([row_max, row_min, row_rain])
-
-# Fill any missing dates between earliest known and yesterday with NA rows
-new_rows = add_na_rows_for_missing_dates(new_rows, summary_file)
-
-# === SAVE FINAL ===
-if new_rows:
-    df = pd.DataFrame(new_rows)
-    df = df.reindex(columns=["Date", "Type"] + known_stations)
-
-    def compute_stats(row):
-        nums = []
-        for s in known_stations:
-            val = row.get(s, "")
-            if val in ("", "NA"):
-                continue
-            try:
-                nums.append(float(val))
-            except:
-                pass
-        if nums:
-            return pd.Series({
-                "Average": round(sum(nums) / len(nums), 1),
-                "Max": round(max(nums), 1),
-                "Min": round(min(nums), 1)
-            })
-        return pd.Series({"Average": "", "Max": "", "Min": ""})
-
-    stats = df.apply(compute_stats, axis=1)
-    df = pd.concat([df, stats], axis=1)
-
-    # Merge with old CSV; keep latest rows (so real data later overrides previous NA)
-    if os.path.exists(summary_file):
-        old_df = pd.read_csv(summary_file)
-        df = pd.concat([old_df, df], ignore_index=True)
-        df.drop_duplicates(subset=["Date", "Type"], keep="last", inplace=True)
-
-    df.sort_values(["Date", "Type"], inplace=True, ignore_index=True)
-    df.to_csv(summary_file, index=False)
+    return [row_max, row_min, row_rain]
+
+def filled_share(rows):
+    """Share of station cells across the rows that parsed to something (a number, trace or NA)."""
+    cells = [r[s] for r in rows for s in known_stations]
+    return sum(1 for c in cells if c != "") / len(cells) if cells else 0.0
+
+def parse_report(doc, date_folder, unmatched, passes=None, ocr=True):
+    """
+    Parse one ReportDocument into its Max / Min / Rainfall rows; unmatched
+    names are appended to `unmatched`. `passes` selects the legacy PASS A,
+    PASS B or both instead of the scanner (the golden-corpus scorer compares
+    them). If the text
+    layer yields less than OCR_MIN_FILLED of the table, the report is read
+    again from OCR (scanned or image-only reports).
+    """
+    mark = len(unmatched)
+    with stage("parse"):
+        rows = read_rows(doc, date_folder, unmatched, passes)
+        if ocr and filled_share(rows) < OCR_MIN_FILLED and doc.apply_ocr("meteorological"):
+            count("ocr_retries")
+            del unmatched[mark:]   # names from the unusable text layer are noise
+            rows = read_rows(doc, date_folder, unmatched, passes)
+    count("weather_empty_cells", sum(1 for r in rows for st in known_stations if r[st] == ""))
+    return rows
+
+def process_folder(date_folder):
+    """Parse reports/<date_folder>; returns (rows, unmatched lines, metrics). Runs in worker processes."""
+    unmatched = []
+    with collecting(date_folder) as metrics, ReportDocument(report_pdf(reports_folder, date_folder)) as doc:
+        rows = parse_report(doc, date_folder, unmatched)
+    return rows, unmatched, metrics.as_dict()
+
+def write_unmatched(date_folder, unmatched):
+    """Names from the latest parse of this report (a re-parse replaces them; counts go to the metrics log)."""
+    log_path = os.path.join(reports_folder, date_folder, "unmatched_stations.log")
+    with open(log_path, "w", encoding="utf-8") as unmatched_log:
+        unmatched_log.writelines(unmatched)
+
+def history_store(root):
+    """Weather dataset in the optional Parquet history (see history_store.py)."""
+    from history_store import HistoryStore
+    return HistoryStore(root, "weather", known_stations, type_key="Type")
+
+def export_history(store, dates=None):
+    """
+    Write summary_file from the history store through write_summary (so
+    only changed days are written, with their delta files): just `dates`, or
+    the whole store, dropping CSV days the store does not have.
+    """
+    if dates is None:
+        df = store.read_wide()
+        days = set(df["Date"]) | summary_dates(summary_file)
+    else:
+        df = store.read_wide(min(dates), max(dates))
+        df, days = df[df["Date"].isin(dates)], set(dates)
+    df = add_stats(df, known_stations, {"Average": "mean", "Max": "max", "Min": "min"})
+    df = write_summary(summary_file, df, ["Date", "Type"], SUMMARY_COLUMNS, replace_days=True, days=days)
+    print(f"Saved: {summary_file} — {len(df)} rows (exported from {store.root})")
+
+def save_summary(new_rows, store=None, fill_gaps=True, quality=None):
+    """
+    Fill date gaps with NA rows, add stats and merge into summary_file (via
+    the history store if given). Chunked runs pass fill_gaps=False for all
+    but the last chunk, so a gap is only filled once every report is in, and
+    a QualityLog that checks each chunk and is flushed at the end, so the
+    checks write quality/ once.
+    """
+    # Fill any missing dates between earliest known and yesterday with NA rows
+    if fill_gaps:
+        new_rows = add_na_rows_for_missing_dates(new_rows, summary_file)
+
+    if not new_rows:
+        print("No rows added.")
+        return
+
+    # Flags go to quality/ and next to the values in the store; the values are written unchanged
+    with stage("validate"):
+        if quality is None:
+            flags = validate_rows("weather", pd.DataFrame(new_rows), known_stations)
+        else:
+            flags = quality.check(pd.DataFrame(new_rows))
+
+    if store is not None:
+        with stage("write"):
+            export_history(store, store.write_rows(new_rows, cell_checks(flags)))
+        return
+
+    with stage("aggregate"):
+        df = pd.DataFrame(new_rows)
+        df = df.reindex(columns=["Date", "Type"] + known_stations)
+        df = add_stats(df, known_stations, {"Average": "mean", "Max": "max", "Min": "min"})
+
+    # Upsert into old CSV; latest rows win (so real data later overrides previous NA)
+    with stage("write"):
+        df = write_summary(summary_file, df, ["Date", "Type"], SUMMARY_COLUMNS)
     print(f"Saved: {summary_file} — {len(df)} rows")
-else:
-    print("No rows added.")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build weather_summary.csv from reports/<date>/weather-<date>.pdf")
+    ap.add_argument("--full-rebuild", action="store_true",
+                    help="ignore the manifest and re-parse every report")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="parse reports in N processes (0 = one per CPU)")
+    ap.add_argument("--chunk-size", type=int, default=0,
+                    help="merge into the CSV every N reports to bound memory (0 = all at once)")
+    ap.add_argument("--metrics", metavar="FILE", default=os.environ.get("METEO_METRICS"),
+                    help="append per-report and per-run metrics as JSON lines (default: $METEO_METRICS)")
+    args = ap.parse_args(argv)
+    log = MetricsLog(args.metrics, "weather")
+    with activated(log.metrics):
+        run(args, log)
+    log.close()
+
+def run(args, log):
+    manifest = ReportManifest(manifest_file, PARSER_VERSION)
+    known_dates = None if args.full_rebuild else summary_dates(summary_file)
+
+    folders = report_folders(reports_folder)
+    todo = [d for d in folders
+            if known_dates is None or not manifest.is_current(report_pdf(reports_folder, d), known_dates)]
+
+    if len(folders) > len(todo):
+        print(f"\nSkipped {len(folders) - len(todo)} unchanged report(s) already in {summary_file}")
+
+    # Each chunk is parsed, merged into the CSV and recorded before the next
+    # starts, so memory is bounded by the chunk, not by the archive
+    chunks = chunked(todo, args.chunk_size)
+    quality = QualityLog("weather", known_stations)
+    for n, chunk in enumerate(chunks, 1):
+        new_rows = []
+        parsed = []  # (pdf, dates) to record once the CSV is written
+
+        # Results come back in folder order whatever the worker count; logs are written here only
+        for date_folder, (rows, unmatched, metrics) in zip(chunk, map_reports(process_folder, chunk, args.workers)):
+            pdf = report_pdf(reports_folder, date_folder)
+            print(f"\nProcessing: {pdf}")
+            log.report(date_folder, metrics)
+            write_unmatched(date_folder, unmatched)
+            new_rows.extend(rows)
+            parsed.append((pdf, [r["Date"] for r in rows]))
+
+        save_summary(new_rows, fill_gaps=n == len(chunks), quality=quality)
+
+        # Only now are the parsed reports reflected in the CSV
+        for pdf, dates in parsed:
+            manifest.record(pdf, dates)
+        manifest.prune()
+        manifest.save()
+
+    with stage("validate"):
+        quality.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# validation.py — data-quality checks on each batch of summary rows, run as it is written
+#
+# Checks (the Check column of quality/<product>_flags.csv):
+#   out_of_range    outside the physical limits for the row type
+#   max_below_min   weather Max below Min for the same station and day (both cells flagged)
+#   climatology     a temperature more than Z_LIMIT standard deviations from the station's mean
+#   jump            a temperature that moved more than JUMP_LIMIT since the day before
+#   duplicate       weather: two stations with the same Max/Min/Rainfall on a day;
+#                   hydro: a whole row repeating the day before (a copied report)
+#
+# Flags are warnings; the summary values are written unchanged. With a history
+# store they are also kept next to the values, in its per-cell `check` column.
+# The per-station statistics behind the climatology and jump checks are kept
+# incrementally in quality/<product>_stats.json, so no check re-reads a summary
+# CSV. A run keeps one QualityLog per product: each batch is checked as it is
+# written, against the statistics from before the run, and both files are
+# written once at the end, so a chunked run flags what an unchunked one does.
+import os
+import json
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from run_metrics import count
+from summary_table import station_values, write_summary
+
+QUALITY_DIR = "quality"
+
+FLAG_COLUMNS = ["Date", "Type", "Station", "Value", "Check"]
+FLAG_KEYS = ["Date", "Type", "Station", "Check"]
+
+# Row type -> (low, high); hydro rows have type ""
+LIMITS = {"Max": (-10.0, 60.0), "Min": (-10.0, 60.0), "Rainfall": (0.0, 500.0), "": (0.0, 500.0)}
+TEMPERATURE_TYPES = ("Max", "Min")
+Z_LIMIT = 4.0
+MIN_HISTORY = 365       # readings a station needs before its climatology is trusted (a year, so the mean spans the seasons)
+JUMP_LIMIT = 10.0       # degrees C, day over day
+MIN_COPIED_VALUES = 3   # non-zero hydro values a repeated row needs before it counts as copied
+
+def quality_files(product: str, quality_dir: str = QUALITY_DIR) -> List[str]:
+    """A product's flag CSV and statistics file."""
+    return [os.path.join(quality_dir, f"{product}_flags.csv"), os.path.join(quality_dir, f"{product}_stats.json")]
+
+def _merge_moments(a: List[float], n: float, mean: float, m2: float) -> List[float]:
+    """Combine running (count, mean, M2) with a batch's (Chan et al.)."""
+    na, ma, m2a = a
+    total = na + n
+    if total == 0:
+        return [0, 0.0, 0.0]
+    delta = mean - ma
+    return [total, ma + delta * n / total, m2a + m2 + delta * delta * na * n / total]
+
+class QualityState:
+    """
+    Running per-station statistics for one product: (count, mean, M2) of each
+    type/station series and its latest (date, value). A type's date is added
+    to the statistics once, and only once it has a value (an NA filler day
+    stays uncounted until a real report fills it); re-parsing it later does
+    not count it again. `baseline` keeps the moments as loaded, for scoring.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.counted: Dict[str, set] = {}
+        self.moments: Dict[str, List[float]] = {}
+        self.last: Dict[str, list] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.counted = {typ: set(dates) for typ, dates in data.get("counted_by_type", {}).items()}
+            self.moments = data.get("moments", {})
+            self.last = data.get("last", {})
+        self.baseline = {key: list(m) for key, m in self.moments.items()}
+
+    def add(self, typ: str, vals: pd.DataFrame) -> None:
+        """Add a type's date x station values to the moments (dates with values not yet counted only)."""
+        counted = self.counted.setdefault(typ, set())
+        fresh = vals[~vals.index.isin(counted) & vals.notna().any(axis=1)]
+        counted.update(fresh.index)
+        n, mean = fresh.count(), fresh.mean()
+        m2 = ((fresh - mean) ** 2).sum()
+        for st in vals.columns:
+            if n[st]:
+                key = f"{typ}|{st}"
+                self.moments[key] = _merge_moments(self.moments.get(key, [0, 0.0, 0.0]),
+                                                   int(n[st]), float(mean[st]), float(m2[st]))
+
+    def advance(self, typ: str, vals: pd.DataFrame) -> None:
+        """Move each station's latest reading forward to this batch's, if newer."""
+        arr = vals.to_numpy()
+        seen = ~np.isnan(arr)
+        last_row = len(arr) - 1 - seen[::-1].argmax(axis=0)
+        for j, st in enumerate(vals.columns):
+            if not seen[:, j].any():
+                continue
+            key, day = f"{typ}|{st}", vals.index[last_row[j]]
+            if key not in self.last or day > self.last[key][0]:
+                self.last[key] = [day, float(arr[last_row[j], j])]
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"counted_by_type": {typ: sorted(d) for typ, d in sorted(self.counted.items())},
+                       "moments": self.moments, "last": self.last}, f)
+        os.replace(tmp, self.path)
+
+def _flags(mask: pd.DataFrame, vals: pd.DataFrame, typ: str, check: str) -> pd.DataFrame:
+    """Long flag rows for the True cells of a date x station mask."""
+    hit = mask.stack()
+    hit = hit[hit]
+    if hit.empty:
+        return pd.DataFrame(columns=FLAG_COLUMNS)
+    dates, stations = hit.index.get_level_values(0), hit.index.get_level_values(1)
+    values = [vals.at[d, s] for d, s in zip(dates, stations)]
+    return pd.DataFrame({"Date": dates, "Type": typ, "Station": stations,
+                         "Value": [str(float(v)) if pd.notna(v) else "" for v in values], "Check": check})
+
+def _previous_day(vals: pd.DataFrame, state: QualityState, typ: str) -> pd.DataFrame:
+    """Each row's values from the calendar day before (from this batch, or the state's latest reading)."""
+    days = pd.to_datetime(vals.index)
+    prev = vals.copy()
+    prev.index = (days + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    prev = prev.reindex(vals.index)
+    for st in vals.columns:
+        last = state.last.get(f"{typ}|{st}")
+        if last:
+            follows = (date.fromisoformat(last[0]) + timedelta(days=1)).isoformat()
+            if follows in prev.index and pd.isna(prev.at[follows, st]):
+                prev.at[follows, st] = last[1]
+    return prev
+
+def check_type(vals: pd.DataFrame, typ: str, state: QualityState) -> List[pd.DataFrame]:
+    """Range, climatology and jump flags for one row type's date x station values."""
+    out = []
+    low, high = LIMITS.get(typ, (-np.inf, np.inf))
+    out.append(_flags((vals < low) | (vals > high), vals, typ, "out_of_range"))
+    if typ in TEMPERATURE_TYPES:
+        stats = pd.DataFrame({st: state.baseline.get(f"{typ}|{st}", [0, 0.0, 0.0]) for st in vals.columns},
+                             index=["n", "mean", "m2"])
+        n = stats.loc["n"]
+        std = np.sqrt(stats.loc["m2"] / (n - 1).where(n > 1))
+        z = (vals - stats.loc["mean"]).abs() / std.where((n >= MIN_HISTORY) & (std > 0))
+        out.append(_flags(z > Z_LIMIT, vals, typ, "climatology"))
+        jump = (vals - _previous_day(vals, state, typ)).abs() > JUMP_LIMIT
+        out.append(_flags(jump, vals, typ, "jump"))
+    return out
+
+def day_values(df: pd.DataFrame, stations: List[str]) -> pd.DataFrame:
+    """date x station floats for rows of one type, the last row of a repeated date winning."""
+    df = df.drop_duplicates(subset="Date", keep="last").sort_values("Date")
+    return station_values(df.set_index("Date"), stations)
+
+def check_weather(df: pd.DataFrame, stations: List[str], state: QualityState) -> List[pd.DataFrame]:
+    by_type = {typ: day_values(g, stations) for typ, g in df.groupby("Type", sort=False)}
+    out = []
+    # Each batch is scored against the statistics from before the run, then added to them
+    for typ, vals in by_type.items():
+        out.extend(check_type(vals, typ, state))
+        state.add(typ, vals)
+        state.advance(typ, vals)
+    if "Max" in by_type and "Min" in by_type:
+        mx, mn = by_type["Max"].align(by_type["Min"])
+        swapped = mx < mn
+        out.append(_flags(swapped, mx, "Max", "max_below_min"))
+        out.append(_flags(swapped, mn, "Min", "max_below_min"))
+    if len(by_type) == 3:
+        triples = pd.concat({typ: v.stack() for typ, v in by_type.items()}, axis=1).dropna()
+        triples.index.names = ["Date", "Station"]
+        dup = triples.reset_index().duplicated(subset=["Date"] + list(by_type), keep=False)
+        for typ, vals in by_type.items():
+            mask = pd.Series(dup.to_numpy(), index=triples.index).unstack().reindex_like(vals)
+            out.append(_flags(mask.fillna(False).astype(bool), vals, typ, "duplicate"))
+    return out
+
+def check_hydro(df: pd.DataFrame, stations: List[str], state: QualityState) -> List[pd.DataFrame]:
+    vals = day_values(df, stations)
+    out = check_type(vals, "", state)
+    # Single equal readings are common (1.0, 2.0 mm); a whole row equal to the day before is a copied report
+    prev = _previous_day(vals, state, "")
+    copied = ((vals == prev) | (vals.isna() & prev.isna())).all(axis=1) & ((vals.fillna(0) != 0).sum(axis=1)
+                                                                          >= MIN_COPIED_VALUES)
+    mask = vals.notna() & copied.to_numpy()[:, None]
+    out.append(_flags(mask, vals, "", "duplicate"))
+    state.add("", vals)
+    state.advance("", vals)
+    return out
+
+class QualityLog:
+    """
+    The checks for one product over a run: check() scores each batch of
+    summary rows as it is written and returns its flags; flush() replaces
+    the checked dates' flags in the flag CSV and saves the statistics, once.
+    """
+
+    def __init__(self, product: str, stations: List[str], quality_dir: Optional[str] = QUALITY_DIR):
+        self.product = product
+        self.stations = stations
+        self.quality_dir = quality_dir
+        self.state: Optional[QualityState] = None
+        self.flags: List[pd.DataFrame] = []
+        self.days: set = set()
+
+    def check(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Flags for one batch of rows; the statistics are loaded on the first batch and kept in memory."""
+        if rows.empty or not self.quality_dir:
+            return pd.DataFrame(columns=FLAG_COLUMNS)
+        if self.state is None:
+            self.state = QualityState(quality_files(self.product, self.quality_dir)[1])
+        check = check_weather if self.product == "weather" else check_hydro
+        parts = [f for f in check(rows, self.stations, self.state) if not f.empty]
+        flags = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=FLAG_COLUMNS)
+        for name, n in flags["Check"].value_counts().items():
+            count(f"quality_{name}", int(n))
+        self.flags.append(flags)
+        self.days.update(rows["Date"])
+        return flags
+
+    def flush(self) -> pd.DataFrame:
+        """Write the flags and statistics of everything checked since the last flush; returns the flags."""
+        if self.state is None:
+            return pd.DataFrame(columns=FLAG_COLUMNS)
+        flags = pd.concat(self.flags, ignore_index=True)
+        os.makedirs(self.quality_dir, exist_ok=True)
+        path = quality_files(self.product, self.quality_dir)[0]
+        if not flags.empty or os.path.exists(path):
+            write_summary(path, flags, FLAG_KEYS, FLAG_COLUMNS, replace_days=True, days=self.days,
+                          delta_dir=None)
+        self.state.save()
+        self.state, self.flags, self.days = None, [], set()
+        if not flags.empty:
+            print(f"[quality] {self.product}: {len(flags)} flag(s) in {path}")
+        return flags
+
+def cell_checks(flags: pd.DataFrame) -> Dict[tuple, str]:
+    """(Date, Type, Station) -> the cell's check names joined by ",", for the history store."""
+    return {key: ",".join(sorted(set(g["Check"])))
+            for key, g in flags.groupby(["Date", "Type", "Station"], sort=False)}
+
+def validate_rows(product: str, rows: pd.DataFrame, stations: List[str],
+                  quality_dir: Optional[str] = QUALITY_DIR) -> pd.DataFrame:
+    """Check one batch of rows and write its flags and statistics at once; returns the flags."""
+    log = QualityLog(product, stations, quality_dir)
+    log.check(rows)
+    return log.flush()
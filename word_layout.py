@@ -0,0 +1,44 @@
+# word_layout.py — group pdfplumber word boxes into table rows and columns by position
+from typing import Callable, Dict, List, Tuple
+
+def words_in(words: List[Dict], top: float, bottom: float, x0: float = 0.0, x1: float = float("inf")) -> List[Dict]:
+    """Words whose box lies inside the given region (vertical centre between top and bottom)."""
+    return [w for w in words
+            if top <= (w["top"] + w["bottom"]) / 2 <= bottom and w["x0"] >= x0 - 1 and w["x1"] <= x1 + 1]
+
+def group_rows(words: List[Dict], tolerance: float = 4.0) -> List[List[Dict]]:
+    """
+    Words bucketed into visual rows, top to bottom, each row sorted left to
+    right. Glyphs from different scripts on one row sit a point or two apart
+    vertically, so a word joins the current row while its top is within
+    `tolerance` of the previous word's.
+    """
+    rows: List[List[Dict]] = []
+    for w in sorted(words, key=lambda w: (w["top"], w["x0"])):
+        if rows and w["top"] - rows[-1][-1]["top"] <= tolerance:
+            rows[-1].append(w)
+        else:
+            rows.append([w])
+    return [sorted(r, key=lambda w: w["x0"]) for r in rows]
+
+def columns(words: List[Dict], keep: Callable[[Dict], bool], gap: float = 30.0,
+            min_size: int = 2) -> List[Tuple[float, float]]:
+    """
+    (x0, x1) spans of the columns formed by the words `keep` accepts,
+    left to right. Words whose horizontal centres are within `gap` of the
+    previous one belong to the same column; clusters smaller than
+    `min_size` are treated as stray and dropped.
+    """
+    picked = sorted((w for w in words if keep(w)), key=lambda w: (w["x0"] + w["x1"]) / 2)
+    clusters: List[List[Dict]] = []
+    for w in picked:
+        centre = (w["x0"] + w["x1"]) / 2
+        if clusters and centre - (clusters[-1][-1]["x0"] + clusters[-1][-1]["x1"]) / 2 <= gap:
+            clusters[-1].append(w)
+        else:
+            clusters.append([w])
+    return [(min(w["x0"] for w in c), max(w["x1"] for w in c)) for c in clusters if len(c) >= min_size]
+
+def rows_text(words: List[Dict]) -> str:
+    """Plain text for word boxes: one line per visual row, words left to right."""
+    return "\n".join(" ".join(w["text"] for w in row) for row in group_rows(words))